@@ -0,0 +1,155 @@
+import concurrent.futures
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+try:
+    from .audiostore import file_digest
+    from .metrics import timer
+except ImportError:
+    from audiostore import file_digest
+    from metrics import timer
+
+_LOG = logging.getLogger(__name__)
+
+# ogg is written with the opus codec, which stays clear at much lower bitrates than mp3
+EXTENSIONS = {'mp3': '.mp3', 'ogg': '.ogg'}
+CODECS = {'ogg': 'libopus'}
+
+
+class AudioSettings:
+    def __init__(self, trim_silence=True, silence_thresh=-50.0, padding_ms=100, target_dbfs=-20.0, format='mp3',
+                 bitrate='64k'):
+        if format not in EXTENSIONS:
+            raise ValueError(f"Unsupported audio format {format}")
+        self.trim_silence = trim_silence
+        self.silence_thresh = silence_thresh
+        self.padding_ms = padding_ms
+        self.target_dbfs = target_dbfs
+        self.format = format
+        self.bitrate = bitrate
+
+    @property
+    def key(self):
+        # part of the cache key, so changing any setting reprocesses instead of reusing old output
+        return (f"{int(self.trim_silence)}:{self.silence_thresh}:{self.padding_ms}:{self.target_dbfs}:"
+                f"{self.format}:{self.bitrate}")
+
+    @property
+    def ext(self):
+        return EXTENSIONS[self.format]
+
+
+def process_file(src, dest, settings, lib_path=None):
+    """Trim, level and re-encode src into dest. Runs in a worker process, hence the plain function."""
+    if lib_path is not None and lib_path not in sys.path:
+        sys.path.insert(0, lib_path)
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+
+    audio = AudioSegment.from_file(src)
+    if settings.trim_silence:
+        start = detect_leading_silence(audio, settings.silence_thresh)
+        end = len(audio) - detect_leading_silence(audio.reverse(), settings.silence_thresh)
+        if end > start:
+            audio = audio[max(0, start - settings.padding_ms):min(len(audio), end + settings.padding_ms)]
+    if settings.target_dbfs is not None and audio.dBFS != float('-inf'):
+        audio = audio.apply_gain(settings.target_dbfs - audio.dBFS)
+    audio.export(dest, format=settings.format, bitrate=settings.bitrate, codec=CODECS.get(settings.format))
+    return os.path.getsize(dest)
+
+
+def pydub_available():
+    return importlib.util.find_spec('pydub') is not None
+
+
+def _make_executor(max_workers):
+    # a spawned worker has to import this module by name. That is cheap when it is a top level module (cli.py,
+    # the benchmarks) but inside anki it would import the whole add-on package, and frozen anki builds would even
+    # start anki itself as the worker, so there a thread pool is used. The heavy lifting happens in ffmpeg anyway.
+    if '.' not in __name__ and not getattr(sys, 'frozen', False):
+        return concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+    return concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='audio-process')
+
+
+class AudioProcessor:
+    """Post-processes downloaded audio in a pool, keeping the results in the AudioStore by source hash."""
+
+    def __init__(self, settings=None, store=None, max_workers=None, lib_path=None):
+        self.settings = AudioSettings() if settings is None else settings
+        self.store = store
+        self.lib_path = lib_path
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.processed = 0
+        self.cached = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = _make_executor(self._max_workers)
+            return self._executor
+
+    def store_key(self, digest):
+        return f"processed:{self.settings.key}:{digest}"
+
+    def process(self, path):
+        """Return the processed version of path, or path itself if it could not be processed."""
+        base, ext = os.path.splitext(path)
+        # never over the original: a failed conversion keeps it, and a raw file is never taken for a processed one
+        dest = base + ('_processed' if ext == self.settings.ext else '') + self.settings.ext
+        try:
+            digest = file_digest(path)
+            key = self.store_key(digest)
+            if self.store is not None:
+                cached = self.store.fetch_cached(dest, key)
+                if cached is not None:
+                    with self._lock:
+                        self.cached += 1
+                    return cached
+            with timer('audio_process'):
+                self._convert(path, dest)
+            if self.store is not None:
+                self.store.add_file(dest, key)
+        except Exception:
+            _LOG.error('Could not process audio %s, keeping the original', path, exc_info=True)
+            with self._lock:
+                self.failed += 1
+            return path
+        with self._lock:
+            self.processed += 1
+        return dest
+
+    def _convert(self, path, dest):
+        directory = os.path.dirname(dest) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=self.settings.ext)
+        os.close(fd)
+        try:
+            size = self._pool().submit(process_file, path, tmp_path, self.settings, self.lib_path).result()
+            with self._lock:
+                self.bytes_in += os.path.getsize(path)
+                self.bytes_out += size
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        with self._lock:
+            return {'processed': self.processed, 'cached': self.cached, 'failed': self.failed,
+                    'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
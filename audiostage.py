@@ -0,0 +1,58 @@
+import concurrent.futures
+import logging
+import threading
+
+try:
+    from .metrics import timer
+    from .cancel import Cancelled, scope
+except ImportError:
+    from metrics import timer
+    from cancel import Cancelled, scope
+
+_LOG = logging.getLogger(__name__)
+
+
+class AudioStage:
+    """Fetches audio for cards on its own workers, so looking up the next word never waits on an mp3."""
+
+    def __init__(self, num_workers=4, token=None):
+        self._token = token
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers,
+                                                               thread_name_prefix='audio')
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, card, on_done=None):
+        """Queue card.fetch_audio(). on_done(card) is called from the worker once the card has its audio (or none)."""
+        future = self._executor.submit(self._fetch, card, on_done)
+        with self._lock:
+            if not future.done():
+                self._pending.add(future)
+        return future
+
+    def _fetch(self, card, on_done):
+        try:
+            with scope(self._token), timer('audio'):
+                card.fetch_audio()
+        except Cancelled:
+            pass
+        except Exception:
+            _LOG.error('Error fetching audio for %s', card.word, exc_info=True)
+        if on_done is not None:
+            on_done(card)
+        return card
+
+    @property
+    def pending(self):
+        with self._lock:
+            self._pending = {future for future in self._pending if not future.done()}
+            return len(self._pending)
+
+    def wait(self, timeout=None):
+        with self._lock:
+            futures = list(self._pending)
+        concurrent.futures.wait(futures, timeout)
+        return self.pending == 0
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+
+try:
+    from .httpclient import get_client
+except ImportError:
+    from httpclient import get_client
+
+_LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS keys_digest ON keys (digest);
+'''
+
+
+def normalize_url(url):
+    if url.startswith('//'):
+        return 'https:' + url
+    return url
+
+
+def url_file_name(url):
+    return urllib.parse.unquote(os.path.basename(urllib.parse.urlparse(url).path))
+
+
+def _open_url(url):
+    return get_client().open(url)
+
+
+def _stream_to_temp(response, directory):
+    """Copy a response into a temp file in directory, returning (temp path, sha1 hex, size)."""
+    digest = hashlib.sha1()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out_file:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out_file.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download(url, dest, opener=_open_url):
+    """Download url to dest without a store, still never leaving a half written file behind."""
+    url = normalize_url(url)
+    directory = os.path.dirname(dest) or '.'
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with opener(url) as response:
+        tmp_path, _, _ = _stream_to_temp(response, directory)
+    os.replace(tmp_path, dest)
+    return dest
+
+
+class AudioStore:
+    """Content addressed audio files with an index from URLs (and other keys) to content hashes."""
+
+    def __init__(self, root, max_mb=500, opener=_open_url):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.opener = opener
+
+        self.hits = 0
+        self.downloads = 0
+        self.evicted = 0
+
+        self._objects_dir = os.path.join(root, 'objects')
+        if not os.path.exists(self._objects_dir):
+            os.makedirs(self._objects_dir)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+
+    def object_path(self, digest, ext):
+        return os.path.join(self._objects_dir, digest[:2], digest + ext)
+
+    def lookup(self, *keys):
+        """Return the digest stored under the first known key, or None."""
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(
+                    'SELECT objects.digest, objects.ext FROM keys JOIN objects ON keys.digest = objects.digest '
+                    'WHERE keys.key = ?', (key,)).fetchone()
+                if row is not None and os.path.exists(self.object_path(*row)):
+                    return row[0]
+        return None
+
+    def fetch(self, url, dest, aliases=()):
+        """Make sure the audio at url is available as dest, downloading it only if it is not stored yet."""
+        url = normalize_url(url)
+        digest = self.lookup(url, *aliases)
+        if digest is None:
+            digest = self._download(url, os.path.splitext(dest)[1])
+            with self._lock:
+                self.downloads += 1
+        else:
+            with self._lock:
+                self.hits += 1
+        self.add_keys(digest, url, *aliases)
+        return self.materialize(digest, dest)
+
+    def fetch_cached(self, dest, *keys):
+        """Like fetch but only from the store, returning None when none of the keys are known."""
+        digest = self.lookup(*keys)
+        if digest is None:
+            return None
+        with self._lock:
+            self.hits += 1
+        return self.materialize(digest, dest)
+
+    def add_file(self, path, *keys):
+        with open(path, 'rb') as in_file:
+            tmp_path, digest, size = _stream_to_temp(in_file, self._objects_dir)
+        self._store(tmp_path, digest, size, os.path.splitext(path)[1])
+        self.add_keys(digest, *keys)
+        return digest
+
+    def add_keys(self, digest, *keys):
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO keys VALUES (?, ?)', [(key, digest) for key in keys])
+            self._db.commit()
+
+    def materialize(self, digest, dest):
+        with self._lock:
+            ext, = self._db.execute('SELECT ext FROM objects WHERE digest = ?', (digest,)).fetchone()
+            self._db.execute('UPDATE objects SET last_used = ? WHERE digest = ?', (time.time(), digest))
+            self._db.commit()
+        source = self.object_path(digest, ext)
+        # the same name may hold another clip, e.g. a newer recording of the word
+        if os.path.exists(dest) and os.path.getsize(dest) == os.path.getsize(source) and file_digest(dest) == digest:
+            return dest
+        directory = os.path.dirname(dest) or '.'
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return dest
+
+    def _download(self, url, ext):
+        _LOG.debug('Downloading audio %s', url)
+        with self.opener(url) as response:
+            tmp_path, digest, size = _stream_to_temp(response, self._objects_dir)
+        self._store(tmp_path, digest, size, ext or os.path.splitext(url_file_name(url))[1])
+        return digest
+
+    def _store(self, tmp_path, digest, size, ext):
+        path = self.object_path(digest, ext)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        with self._lock:
+            exists = self._db.execute('SELECT 1 FROM objects WHERE digest = ?', (digest,)).fetchone()
+            if exists is None:
+                self._total_bytes += size
+            self._db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)', (digest, ext, size, time.time()))
+            self._evict(keep=digest)
+            self._db.commit()
+
+    def _evict(self, keep):
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._db.execute('SELECT digest, ext, size FROM objects ORDER BY last_used').fetchall()
+        for digest, ext, size in rows:
+            if self._total_bytes <= target:
+                break
+            if digest == keep:
+                continue
+            path = self.object_path(digest, ext)
+            if os.path.exists(path):
+                os.remove(path)
+            self._db.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+            self._db.execute('DELETE FROM keys WHERE digest = ?', (digest,))
+            self._total_bytes -= size
+            self.evicted += 1
+
+    @property
+    def size(self):
+        return self._total_bytes
+
+    def stats(self):
+        return {'hits': self.hits, 'downloads': self.downloads, 'evicted': self.evicted, 'bytes': self._total_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,82 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(bench_dir)
+
+
+def local_imports(source):
+    """The add-on's own modules a file imports relatively at module level (imports inside functions wait)."""
+    modules = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.ImportFrom) and node.level == 1:
+            names = [node.module] if node.module else [alias.name for alias in node.names]
+            for name in names:
+                if os.path.exists(os.path.join(root_dir, name + '.py')) and name not in modules:
+                    modules.append(name)
+    return modules
+
+
+def read_source(path, rev=None):
+    if rev is None:
+        with open(os.path.join(root_dir, path), 'r', encoding='utf-8') as f:
+            return f.read()
+    return subprocess.run(['git', 'show', f'{rev}:{path}'], cwd=root_dir, check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout
+
+
+_MEASURE = '''
+import sys, time
+sys.path[:0] = {paths!r}
+start = time.perf_counter()
+skipped = []
+for name in {modules!r}:
+    try:
+        __import__(name)
+    except ImportError as e:
+        skipped.append(name + ' (' + str(e) + ')')
+print(round((time.perf_counter() - start) * 1000, 1), len(sys.modules), '; '.join(skipped))
+'''
+
+
+def import_cost(modules):
+    """Milliseconds and modules loaded importing modules in a fresh interpreter, after what it loads anyway."""
+    paths = [root_dir, os.path.join(root_dir, 'vendor')]
+    base = subprocess.run([sys.executable, '-c', _MEASURE.format(paths=paths, modules=[])], check=True,
+                          stdout=subprocess.PIPE, universal_newlines=True).stdout.split(' ', 2)
+    out = subprocess.run([sys.executable, '-c', _MEASURE.format(paths=paths, modules=modules)], check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout.strip().split(' ', 2)
+    return float(out[0]), int(out[1]) - int(base[1]), out[2] if len(out) > 2 else ''
+
+
+def report(label, modules, repeat):
+    if not modules:
+        print(f'{label:<28} nothing of the add-on imported')
+        return
+    runs = [import_cost(modules) for _ in range(repeat)]
+    ms = sorted(run[0] for run in runs)[len(runs) // 2]
+    print(f'{label:<28} {ms:>8.1f} ms  {runs[0][1]:>5} modules  ({len(modules)} of the add-on\'s)')
+    if runs[0][2]:
+        # anki, aqt and Qt are loaded by Anki before any add-on, so those are not missed
+        print(f'{"":<28} not importable here: {runs[0][2]}')
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Time the add-on's own imports at Anki startup (__init__.py) and on first use (ui.py)")
+    arg_parser.add_argument('--baseline', help='Also time the startup imports of __init__.py at this git revision')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the median is shown')
+    args = arg_parser.parse_args(argv)
+
+    if args.baseline:
+        report(f'startup at {args.baseline}', local_imports(read_source('__init__.py', args.baseline)), args.repeat)
+    report('startup', local_imports(read_source('__init__.py')), args.repeat)
+    report('first use', local_imports(read_source('ui.py')), args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+
+from inflindex import InflectionIndex
+from replay import lemma, plural
+
+# opening the index and the first lookup, on a full dump's worth of lemmas
+MAX_MS = 50.0
+CASES = ['', 'а', 'у', 'ом', 'е', 'ы', 'ам', 'ами', 'ах']
+
+
+class SyntheticEntry:
+    def __init__(self, word):
+        self.word = word
+        self.inflections = ()
+        # already normalized, like entry_keys would make them
+        self.normalized_keys = frozenset([word, plural(word)] + [word + case for case in CASES])
+
+
+def build(path, lemmas):
+    index = InflectionIndex(path, 'Russian')
+    for i in range(lemmas):
+        index.add_entry(SyntheticEntry(lemma(i)))
+    index.close()
+
+
+def load_ms(path, word, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = InflectionIndex(path, 'Russian')
+        found = index.lookup(word)
+        runs.append((time.perf_counter() - start) * 1000)
+        index.close()
+        assert found, f'{word} not in the index'
+    return sorted(runs)[len(runs) // 2]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Time opening the inflection index and its first lookup')
+    arg_parser.add_argument('--lemmas', type=int, default=100000)
+    arg_parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the median is shown')
+    arg_parser.add_argument('--max-ms', type=float, default=MAX_MS)
+    args = arg_parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'inflections.sqlite')
+        start = time.perf_counter()
+        build(path, args.lemmas)
+        build_seconds = time.perf_counter() - start
+        ms = load_ms(path, plural(lemma(args.lemmas // 2)), args.repeat)
+        result = {'lemmas': args.lemmas, 'build_seconds': round(build_seconds, 2), 'load_ms': round(ms, 2),
+                  'mb': round(os.path.getsize(path) / 1024 / 1024, 1)}
+    print(f"{args.lemmas} lemmas  {result['mb']} MB  open and first lookup {ms:.2f} ms", file=sys.stderr)
+    print(json.dumps(result))
+    if ms > args.max_ms:
+        print(f'Loading the index took {ms:.2f} ms, more than {args.max_ms} ms', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
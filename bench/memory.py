@@ -0,0 +1,91 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+
+import dumpparser
+from builddeck import DeckBuilder, get_deck
+from pipeline import CardMaker
+from replay import has_form_entry, lemma, plural, write_dump
+
+# peak memory may grow by this fraction between the two largest sizes, by then every cache is full
+TOLERANCE = 0.1
+# deck calls queued ahead of the deck thread before waiting for it, like the add-on's audio stage
+QUEUE = 256
+
+
+def words(size):
+    # forms that have their own entry, so the shared lemma graph has pages to follow;
+    # made one at a time, the input list is the caller's and not part of what a batch keeps
+    for i in range(size):
+        yield plural(lemma(i)) if has_form_entry(i) else lemma(i)
+
+
+def measure(size, store, out_dir):
+    """Peak memory streaming size words through a CardMaker and a DeckBuilder, like a STREAM_EXPORT batch."""
+    out_file = os.path.join(out_dir, f'memory-{size}.apkg')
+    gc.collect()
+    loggers = len(logging.Logger.manager.loggerDict)
+    tracemalloc.start()
+    maker = CardMaker('Russian', dictionary=store)
+    builder = DeckBuilder(get_deck('Russian'))
+    builder.stream_to(out_file)
+    pending = None
+    for i, word in enumerate(words(size)):
+        future = builder.add_flashcard(maker.make(word))
+        if i % QUEUE == 0:
+            if pending is not None:
+                pending.result()
+            pending = future
+    files = builder.export().result()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    for path in files:
+        os.remove(path)
+    return {'size': size, 'peak_mb': round(peak / 1024 / 1024, 2), 'bytes_per_card': round(peak / size, 1),
+            'lemmas': maker.lemmas.stats()['lemmas'],
+            'loggers_added': len(logging.Logger.manager.loggerDict) - loggers}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Peak memory of a streamed batch as the number of cards grows')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    arg_parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.CRITICAL)
+    sizes = sorted(args.sizes)
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, 'dump.jsonl')
+        store = os.path.join(tmp, 'russian.sqlite')
+        # the audio links are never fetched, the bench is about what a batch keeps, not about downloads
+        write_dump(dump, sizes[-1], 'http://localhost/')
+        dumpparser.build_store(dump, 'Russian', store)
+        # modules the pipeline imports on first use are not part of any batch
+        measure(10, store, tmp)
+        for size in sizes:
+            run = measure(size, store, tmp)
+            print(f"{size:>7} cards  peak {run['peak_mb']:>7.2f} MB  {run['bytes_per_card']:>8.1f} bytes/card  "
+                  f"{run['lemmas']} lemma edges  {run['loggers_added']} loggers added", file=sys.stderr)
+            runs.append(run)
+    print(json.dumps(runs))
+
+    growth = runs[-1]['peak_mb'] / runs[-2]['peak_mb'] - 1 if len(runs) > 1 else 0.0
+    if growth > args.tolerance or any(run['loggers_added'] for run in runs):
+        print(f'Peak memory is not flat: {growth:+.1%} from {runs[-2]["size"]} to {runs[-1]["size"]} cards',
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
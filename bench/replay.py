@@ -0,0 +1,226 @@
+# local stand-in for wiktionary and the forvo api, serving made up words with injectable latency and errors
+import json
+import random
+import sys
+import threading
+import time
+import types
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dumpparser import DumpEntry, DumpParser
+
+SYLLABLES = ['ка', 'ло', 'ми', 'ну', 'ро', 'се', 'та', 'ви', 'до', 'жу']
+# a few hundred bytes is enough to exercise the audio store and package media
+MP3 = b'ID3\x03\x00\x00\x00\x00\x00\x00' + bytes(range(256)) * 2
+
+
+def lemma(i):
+    digits = f'{i:05d}'
+    return ''.join(SYLLABLES[int(d)] for d in digits)
+
+
+def plural(word):
+    return word + 'ов'
+
+
+def has_wiktionary_audio(i):
+    return i % 2 == 0
+
+
+def has_form_entry(i):
+    # these forms get their own "form of" entry, the rest are only listed as forms of the lemma
+    return i % 3 == 0
+
+
+def word_list(size, seed=0):
+    """size words: mostly lemmas, some inflected forms and a few that do not exist."""
+    rng = random.Random(seed)
+    words = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.05:
+            words.append(lemma(i) + 'щщ')
+        elif roll < 0.25:
+            words.append(plural(lemma(i)))
+        else:
+            words.append(lemma(i))
+    return words
+
+
+def write_dump(path, size, audio_base):
+    """wiktextract style JSONL for the first size lemmas, for dumpparser.build_store."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(size):
+            word = lemma(i)
+            record = {
+                'word': word,
+                'lang': 'Russian',
+                'pos': 'noun',
+                'senses': [{'glosses': [f'meaning {i}'], 'examples': [{'text': f'{word} тут', 'english': 'here'}]},
+                           {'glosses': [f'other meaning {i}']}],
+                'forms': [{'form': plural(word), 'tags': ['genitive', 'plural']}],
+                'sounds': [{'mp3_url': f'{audio_base}{urllib.parse.quote(word)}.mp3'}] if has_wiktionary_audio(i) else [],
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if has_form_entry(i):
+                form = {
+                    'word': plural(word),
+                    'lang': 'Russian',
+                    'pos': 'noun',
+                    'senses': [{'glosses': [f'genitive plural of {word}'], 'form_of': [{'word': word}]}],
+                }
+                f.write(json.dumps(form, ensure_ascii=False) + '\n')
+
+
+def forvo_response(word, audio_base, code='ru'):
+    return {
+        'attributes': {'total': 1},
+        'items': [{'username': 'bench', 'word': word, 'sex': 'f', 'country': 'Russia', 'rate': 1, 'num_votes': 1,
+                   'pathmp3': f'{audio_base}forvo_{urllib.parse.quote(word)}.mp3', 'code': code}],
+    }
+
+
+def page_data(entry):
+    # the dumpparser record an entry was made from, so DumpEntry can make it again on the other side
+    return {
+        'word': entry.word,
+        'pos': entry.part_of_speech,
+        'senses': [{'text': definition.text,
+                    'examples': [[example.text, example.translation] for example in definition.examples]}
+                   for definition in entry.definitions],
+        'forms': entry.inflections.forms if entry.inflections is not None else [],
+        'audio': entry.audio_links,
+        'form_of': entry.base_links,
+    }
+
+
+class ReplayPages:
+    """A dumpparser store answering like wiktionary: the entries on a page and opensearch results."""
+
+    def __init__(self, language, store):
+        self._parser = DumpParser(language, store)
+
+    def page(self, title):
+        return [page_data(entry) for entry in self._parser.fetch(title)]
+
+    def search(self, word):
+        return self._parser.search(word)
+
+
+class ReplayWiktionaryParser:
+    """Stands in for russianwiktionaryparser.WiktionaryParser, reading pages off the replay server.
+
+    Like the real one it does its own HTTP rather than going through httpclient, so its failures reach the
+    pipeline's ResilientParser and CachedParser the same way.
+    """
+
+    BASE_URL = None
+    TIMEOUT = 15
+
+    def __init__(self, language='Russian'):
+        self.language = language
+
+    def fetch(self, word):
+        return [DumpEntry(self, record['word'], record) for record in self._get('wiki', word)]
+
+    def search(self, word):
+        return self._get('search', word)
+
+    def fetch_from_url(self, url):
+        return self.fetch(urllib.parse.unquote(url.rsplit('/', 1)[-1]))
+
+    def _get(self, call, word):
+        url = f'{ReplayWiktionaryParser.BASE_URL}{call}/{urllib.parse.quote(word)}'
+        with urllib.request.urlopen(url, timeout=ReplayWiktionaryParser.TIMEOUT) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def install_wiktionary(base_url):
+    """Have the pipeline look words up on the replay server, whether or not the parser submodule is checked out."""
+    ReplayWiktionaryParser.BASE_URL = base_url
+    module = types.ModuleType('russianwiktionaryparser')
+    module.WiktionaryParser = ReplayWiktionaryParser
+    sys.modules['russianwiktionaryparser'] = module
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.delay()
+        if server.fail():
+            self._send(503, b'injected failure')
+            return
+        parts = self.path.strip('/').split('/')
+        if parts[0] == 'audio':
+            # distinct bytes per file, or the package would rightly keep only one of them
+            self._send(200, MP3 + self.path.encode('utf-8'), 'audio/mpeg')
+        elif parts[0] == 'forvo' and len(parts) > 1:
+            word = urllib.parse.unquote(parts[1])
+            body = json.dumps(forvo_response(word, server.audio_base)).encode('utf-8')
+            self._send(200, body, 'application/json')
+        elif parts[0] in ('wiki', 'search') and len(parts) > 1 and server.pages is not None:
+            word = urllib.parse.unquote(parts[1])
+            result = server.pages.page(word) if parts[0] == 'wiki' else server.pages.search(word)
+            self._send(200, json.dumps(result, ensure_ascii=False).encode('utf-8'), 'application/json')
+        else:
+            self._send(404, b'missing')
+
+    def _send(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        super().__init__(('127.0.0.1', 0), ReplayHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # ReplayPages to answer wiki and search requests with, none unless words are looked up on "wiktionary"
+        self.pages = None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    @property
+    def audio_base(self):
+        return self.base_url + 'audio/'
+
+    @property
+    def forvo_base(self):
+        return self.base_url + 'forvo/'
+
+    def delay(self):
+        with self._lock:
+            seconds = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+        if seconds:
+            time.sleep(seconds)
+
+    def fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
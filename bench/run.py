@@ -0,0 +1,203 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, root_dir)
+sys.path.insert(0, bench_dir)
+
+RESULTS_DIR = os.path.join(bench_dir, 'results')
+# compared runs fail when words/sec drops or peak RSS grows by more than this fraction
+TOLERANCE = 0.1
+
+
+def peak_rss_mb():
+    """Peak memory of this process, None where neither resource (Unix) nor psutil is there to ask."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        # peak working set, Windows only
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return None if peak is None else peak / 1024 / 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+def run_one(size, workers, latency, jitter, error_rate, stream, seed, source='store'):
+    """One pipeline run over size words against a fresh replay server, with cold caches.
+
+    With source 'wiktionary' the words are looked up through the wiktionary parser path (retries, circuit breaker,
+    response cache) instead of the local store, and the list is run a second time to time it with a warm cache.
+    """
+    import logging
+    import cli
+    import dumpparser
+    import pyforvo
+    from replay import ReplayPages, ReplayServer, install_wiktionary, word_list, write_dump
+
+    logging.basicConfig(level=logging.CRITICAL)
+    server = ReplayServer(latency, jitter, error_rate, seed).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = os.path.join(tmp, 'dump.jsonl')
+            store = os.path.join(tmp, 'russian.sqlite')
+            write_dump(dump, size, server.audio_base)
+            dumpparser.build_store(dump, 'Russian', store)
+
+            pyforvo.ForvoAgent.BASE_URL = server.forvo_base
+            os.environ['FORVO_API_KEY'] = 'bench'
+            dictionary = store
+            if source == 'wiktionary':
+                server.pages = ReplayPages('Russian', store)
+                install_wiktionary(server.base_url)
+                dictionary = None
+
+            def build():
+                start = time.perf_counter()
+                report = cli.build_package(word_list(size, seed), 'Russian', os.path.join(tmp, 'bench.apkg'),
+                                           workers, os.path.join(tmp, 'data'), os.path.join(tmp, 'media'),
+                                           dictionary, stream=stream, forvo_limit=size * 2, resume=False)
+                return report, time.perf_counter() - start
+
+            report, seconds = build()
+            warm = build() if source == 'wiktionary' else None
+    finally:
+        server.stop()
+
+    export = report['stages'].get('export', {})
+    peak = peak_rss_mb()
+    run = {
+        'size': size,
+        'source': source,
+        'seconds': round(seconds, 3),
+        'words_per_sec': round(size / seconds, 1),
+        'export_seconds': export.get('total', 0.0),
+        'peak_rss_mb': None if peak is None else round(peak, 1),
+        'cards': report['cards'],
+        'not_found': len(report['not_found']),
+        'failed': len(report['failed']),
+        'stages': report['stages'],
+        'http': report['http'],
+        'network': report['network'],
+        'cache': report['cache'],
+    }
+    if warm is not None:
+        warm_report, warm_seconds = warm
+        run['warm_words_per_sec'] = round(size / warm_seconds, 1)
+        run['warm_cache'] = warm_report['cache']
+    return run
+
+
+def run_sizes(args):
+    runs = []
+    for size in args.sizes:
+        # every size in its own process so peak RSS belongs to that size alone
+        command = [sys.executable, os.path.abspath(__file__), '--one', str(size), '--workers', str(args.workers),
+                   '--latency', str(args.latency), '--jitter', str(args.jitter),
+                   '--error-rate', str(args.error_rate), '--seed', str(args.seed), '--source', args.source]
+        if args.stream:
+            command.append('--stream')
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        warm = f"  warm {run['warm_words_per_sec']:.1f} words/s" if 'warm_words_per_sec' in run else ''
+        print(f"{size:>7} words  {run['words_per_sec']:>8.1f} words/s  export {run['export_seconds']:.3f}s  "
+              f"peak {format_mb(run['peak_rss_mb'])}{warm}", file=sys.stderr)
+        runs.append(run)
+    return runs
+
+
+def format_mb(mb):
+    return 'n/a' if mb is None else f'{mb:.1f} MB'
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root_dir, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Print the change per size and return the sizes that got slower or bigger than tolerance allows."""
+    before = {run['size']: run for run in baseline['runs']}
+    regressions = []
+    for run in current['runs']:
+        old = before.get(run['size'])
+        if old is None:
+            continue
+        speed = run['words_per_sec'] / old['words_per_sec'] - 1
+        memory = None
+        if run['peak_rss_mb'] and old['peak_rss_mb']:
+            memory = run['peak_rss_mb'] / old['peak_rss_mb'] - 1
+        print(f"{run['size']:>7} words  words/s {speed:+.1%}  "
+              f"peak RSS {'n/a' if memory is None else format(memory, '+.1%')}  "
+              f"export {run['export_seconds'] - old['export_seconds']:+.3f}s")
+        if speed < -tolerance or (memory is not None and memory > tolerance):
+            regressions.append(run['size'])
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark the card pipeline against a local replay server')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    arg_parser.add_argument('-j', '--workers', type=int, default=4)
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to every response')
+    arg_parser.add_argument('--jitter', type=float, default=0.01, help='Standard deviation of the added latency')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--stream', action='store_true', help='Stream notes into the package')
+    arg_parser.add_argument('--source', default='store', choices=['store', 'wiktionary'],
+                            help='Look words up in the local store or, replayed, on wiktionary')
+    arg_parser.add_argument('-o', '--out', help='Results file, defaults to bench/results/<time>.json')
+    arg_parser.add_argument('--baseline', help='Earlier results file to compare against')
+    arg_parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    arg_parser.add_argument('--one', type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.one is not None:
+        print(json.dumps(run_one(args.one, args.workers, args.latency, args.jitter, args.error_rate, args.stream,
+                                 args.seed, args.source)))
+        return 0
+
+    results = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'workers': args.workers, 'latency': args.latency, 'jitter': args.jitter,
+                    'error_rate': args.error_rate, 'stream': args.stream, 'seed': args.seed, 'source': args.source},
+        'runs': run_sizes(args),
+    }
+    out = args.out
+    if out is None:
+        if not os.path.exists(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        out = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {out}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"Regressed at {', '.join(map(str, regressions))} words", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,48 @@
+import concurrent.futures
 import os
+import itertools
+import json
 import logging
+import sqlite3
+import tempfile
+import time
+import zipfile
 import genanki
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+try:
+    from .normalize import normalize
+    from .metrics import timer
+    from .audiostore import file_digest
+except ImportError:
+    from normalize import normalize
+    from metrics import timer
+    from audiostore import file_digest
+
+# already compressed, deflating them again only costs time
+STORED_EXTENSIONS = {'.mp3', '.ogg', '.opus', '.m4a', '.aac', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.webm', '.mp4'}
 
 
 def to_html(defs, part_of_speech):
-    html_str = "<b>{}</b>".format(part_of_speech)
-    html_str += "<ol>"
+    parts = ["<b>{}</b>".format(part_of_speech), "<ol>"]
     for d in defs:
-        html_str += "<li>{}</li>".format(d.text)
+        parts.append("<li>{}</li>".format(d.text))
         if d.examples:
-            html_str += "<div class=examples><ul>"
-            for example in d.examples:
-                html_str += f"<li>{example.text} - {example.translation}</li>"
-            html_str += "</ul></div>"
+            parts.append("<div class=examples><ul>")
+            parts.extend(f"<li>{example.text} - {example.translation}</li>" for example in d.examples)
+            parts.append("</ul></div>")
+
+    parts.append("</ol>")
+    return ''.join(parts)
+
 
-    html_str += "</ol>"
-    return html_str
+def card_html(card):
+    # rendered once per chosen entry and shared by the results view and the deck
+    cached = getattr(card, '_html', None)
+    if cached is None or cached[0] is not card.chosen_entry:
+        cached = card._html = (card.chosen_entry, to_html(card.definitions, card.part_of_speech))
+    return cached[1]
 
 
 def get_deck(language):
@@ -31,6 +58,136 @@ def get_deck(language):
         raise Exception(f"Unimplemented language {language}")
 
 
+class MediaSet:
+    """Media files by content, so audio shared by several notes (or saved under two names) is packaged once."""
+
+    def __init__(self):
+        self.files = {}
+        self._names = {}
+
+    def add(self, path):
+        """Return the name notes should use to refer to path."""
+        digest = file_digest(path)
+        name = self._names.get(digest)
+        if name is None:
+            name = os.path.basename(path)
+            if name in self.files:
+                # same name but different audio, e.g. two pronunciations of a word from different sources
+                base, ext = os.path.splitext(name)
+                name = f"{base}_{digest[:8]}{ext}"
+            self._names[digest] = name
+            self.files[name] = path
+        return name
+
+    def __len__(self):
+        return len(self.files)
+
+
+def _compress_type(name):
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class PackageWriter:
+    """Writes notes straight into the package database as they arrive instead of holding them all in memory.
+
+    With max_mb set, a new .apkg shard is started whenever the current one would grow past that size.
+    """
+
+    COMMIT_EVERY = 500
+
+    def __init__(self, out_file, deck_id, deck_name, model, max_mb=None, timestamp=None):
+        self.out_file = out_file
+        self.deck_id = deck_id
+        self.deck_name = deck_name
+        self.model = model
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._id_gen = itertools.count(int(self.timestamp * 1000))
+
+        self.files = []
+        self.num_notes = 0
+        self._zip = None
+        self._conn = None
+        self._db_path = None
+        self._media = {}
+        self._media_names = set()
+        self._shard_notes = 0
+        self._shard_bytes = 0
+
+    def _shard_name(self):
+        if self.max_bytes is None:
+            return self.out_file
+        base, ext = os.path.splitext(self.out_file)
+        return f"{base}-{len(self.files) + 1:03d}{ext or '.apkg'}"
+
+    def _open_shard(self):
+        path = self._shard_name()
+        self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        fd, self._db_path = tempfile.mkstemp(suffix='.anki2')
+        os.close(fd)
+        self._conn = sqlite3.connect(self._db_path)
+        cursor = self._conn.cursor()
+        cursor.executescript(APKG_SCHEMA)
+        cursor.executescript(APKG_COL)
+        shell = genanki.Deck(self.deck_id, self.deck_name)
+        shell.add_model(self.model)
+        shell.write_to_db(cursor, self.timestamp, self._id_gen)
+        self._media = {}
+        self._media_names = set()
+        self._shard_notes = 0
+        self._shard_bytes = 0
+        self.files.append(path)
+
+    def _close_shard(self):
+        self._conn.commit()
+        self._conn.close()
+        self._zip.write(self._db_path, 'collection.anki2')
+        self._zip.writestr('media', json.dumps(self._media))
+        self._zip.close()
+        os.remove(self._db_path)
+        self._zip = self._conn = self._db_path = None
+
+    def add_note(self, note, media=()):
+        """media is (name, path) pairs, each written to a shard the first time its name is seen there."""
+        note_bytes = sum(len(field.encode('utf-8')) for field in note.fields)
+        media_bytes = sum(os.path.getsize(path) for name, path in media if name not in self._media_names)
+        if self._zip is None:
+            self._open_shard()
+        elif (self.max_bytes is not None and self._shard_notes
+              and self._shard_bytes + note_bytes + media_bytes > self.max_bytes):
+            self._close_shard()
+            self._open_shard()
+
+        note.write_to_db(self._conn.cursor(), self.timestamp, self.deck_id, self._id_gen)
+        for name, path in media:
+            self.add_media(name, path)
+        self._shard_notes += 1
+        self._shard_bytes += note_bytes
+        self.num_notes += 1
+        if self._shard_notes % PackageWriter.COMMIT_EVERY == 0:
+            self._conn.commit()
+
+    def add_media(self, name, path):
+        if self._zip is None:
+            self._open_shard()
+        if name in self._media_names:
+            return
+        idx = str(len(self._media))
+        self._zip.write(path, idx, _compress_type(name))
+        self._media[idx] = name
+        self._media_names.add(name)
+        self._shard_bytes += os.path.getsize(path)
+
+    def close(self):
+        if self._zip is None and not self.files:
+            self._open_shard()
+        if self._zip is not None:
+            self._close_shard()
+        return self.files
+
+
 class VocabDeck:
     def __init__(self, guid, name, model):
         self.logger = logging.getLogger(__name__)
@@ -46,33 +203,64 @@ class VocabDeck:
             css=model['css'],
             templates=model['templates']
         )
-        self.media_files = []
+        self.media = MediaSet()
+        self.writer = None
+
+    def stream_to(self, out_file, max_mb=None):
+        """Write every note added from now on straight to out_file (or size capped shards of it)."""
+        self.writer = PackageWriter(out_file, self.guid, self.name, self.model, max_mb)
 
-    def add_note(self, front, back, audio_file=''):
+    def note_guid(self, word, part_of_speech=''):
+        # same word and part of speech always gets the same guid, so re-importing updates the note in place.
+        # Several languages share a model, the deck keeps a word from one overwriting the same word in another
+        return genanki.guid_for(self.model.model_id, self.guid, normalize(word), normalize(part_of_speech))
+
+    def add_note(self, front, back, audio_file='', part_of_speech=''):
+        media = []
         if audio_file:
-            fname = os.path.split(audio_file)[-1]
+            fname = self.media.add(audio_file)
             audio = '[sound:' + fname + ']'
-            self.media_files.append(audio_file)
+            media.append((fname, audio_file))
         else:
             audio = ''
 
-        note = genanki.Note(model=self.model, fields=[front, back, audio])
+        note = genanki.Note(model=self.model, fields=[front, back, audio], guid=self.note_guid(front, part_of_speech))
+        if self.writer is not None:
+            self.writer.add_note(note, media)
+            return
         self.deck.add_note(note)
 
     def add_flashcard(self, card):
-        self.logger.debug("Adding word: {}".format(card.word))
-        self.logger.debug("Adding defs: {}".format(to_html(card.definitions, card.part_of_speech)))
-        self.logger.debug("Adding audio: {}".format(card.audio_file))
+        with timer('deck_add'):
+            self._add_flashcard(card)
+
+    def _add_flashcard(self, card):
+        back = card_html(card)
+        self.logger.debug("Adding word: %s", card.word)
+        self.logger.debug("Adding defs: %s", back)
+        self.logger.debug("Adding audio: %s", card.audio_file)
         audio_file = '' if card.audio_file is None else card.audio_file
-        self.add_note(card.word, to_html(card.definitions, card.part_of_speech), audio_file)
+        self.add_note(card.word, back, audio_file, card.part_of_speech)
 
     def write_to_collection(self):
         self.deck.write_to_collection_from_addon()
 
     def export(self, out_file='output.apkg'):
-        package = genanki.Package(self.deck)
-        package.media_files = self.media_files
-        package.write_to_file(out_file)
+        with timer('export'):
+            return self._export(out_file)
+
+    def _export(self, out_file):
+        if self.writer is not None:
+            files = self.writer.close()
+            self.writer = None
+            return files
+        # one pass: notes into the database, then each distinct media file straight into the zip
+        writer = PackageWriter(out_file, self.guid, self.name, self.model)
+        for note in self.deck.notes:
+            writer.add_note(note)
+        for name, path in self.media.files.items():
+            writer.add_media(name, path)
+        return writer.close()
 
 
 class RussianVocabDeck(VocabDeck):
@@ -188,4 +376,78 @@ class GermanVocabDeck(VocabDeck):
             }]
         }
 
-        super().__init__(guid, name, model)
\ No newline at end of file
+        super().__init__(guid, name, model)
+
+
+def language_file(out_file, language, default_language):
+    """out_file for default_language, out_file with the language added to its name for the others."""
+    if language == default_language:
+        return out_file
+    root, ext = os.path.splitext(out_file)
+    return f'{root}-{language}{ext}'
+
+
+class DeckSet:
+    """Takes a mixed language batch the way a VocabDeck takes one language: each card goes to its language's deck,
+    and each deck exports its own package."""
+
+    def __init__(self, default_language):
+        self.default_language = default_language
+        self.decks = {}
+        self._stream = None
+
+    def deck(self, language):
+        deck = self.decks.get(language)
+        if deck is None:
+            deck = self.decks[language] = get_deck(language)
+            if self._stream is not None:
+                out_file, max_mb = self._stream
+                deck.stream_to(language_file(out_file, language, self.default_language), max_mb)
+        return deck
+
+    def stream_to(self, out_file, max_mb=None):
+        # decks of languages met later in the batch start streaming when their first card arrives
+        self._stream = (out_file, max_mb)
+        for language, deck in self.decks.items():
+            deck.stream_to(language_file(out_file, language, self.default_language), max_mb)
+
+    def add_flashcard(self, card):
+        self.deck(getattr(card, 'language', None) or self.default_language).add_flashcard(card)
+
+    def export(self, out_file='output.apkg'):
+        if self._stream is not None and out_file is None:
+            # a streamed set is exported without a name, its files were named in stream_to
+            out_file = self._stream[0]
+        if not self.decks:
+            self.deck(self.default_language)
+        files = []
+        for language, deck in self.decks.items():
+            files.extend(deck.export(language_file(out_file, language, self.default_language)))
+        self._stream = None
+        return files
+
+
+class DeckBuilder:
+    """Runs every call on a deck on one background thread, in the order the calls were made."""
+
+    def __init__(self, deck):
+        self.deck = deck
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='deck')
+
+    def stream_to(self, out_file, max_mb=None):
+        return self._executor.submit(self.deck.stream_to, out_file, max_mb)
+
+    def add_flashcard(self, card):
+        return self._executor.submit(self.deck.add_flashcard, card)
+
+    def add_flashcards(self, cards):
+        return self._executor.submit(lambda: [self.deck.add_flashcard(card) for card in cards])
+
+    def export(self, out_file='output.apkg'):
+        return self._executor.submit(self._export, out_file)
+
+    def _export(self, out_file):
+        files = self.deck.export(out_file)
+        # kept running after a failed export, so it can be tried again
+        self._executor.shutdown(wait=False)
+        return files
@@ -0,0 +1,78 @@
+import contextlib
+import logging
+import threading
+
+_LOG = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    """The run was cancelled. Not an OSError, so it is never retried or counted as a failed lookup."""
+
+
+class CancelToken:
+    """Set once by whoever cancels a run. Network calls made in its scope check it and get aborted by it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_key = 0
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                _LOG.debug('Cancel callback failed', exc_info=True)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout):
+        """Sleep for timeout seconds or until cancelled. Returns True if cancelled."""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """Call callback when cancelled, right away if it already is. Returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                key = self._next_key
+                self._next_key += 1
+                self._callbacks[key] = callback
+                return lambda: self._remove(key)
+        callback()
+        return lambda: None
+
+    def _remove(self, key):
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+
+_local = threading.local()
+
+
+def current():
+    """Token of the run this thread is working for, if any."""
+    return getattr(_local, 'token', None)
+
+
+@contextlib.contextmanager
+def scope(token):
+    # pool threads are shared between runs, so the token is set around each piece of work rather than per thread
+    previous = current()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
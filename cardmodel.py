@@ -0,0 +1,49 @@
+import sys
+
+
+class Example:
+    __slots__ = ('text', 'translation')
+
+    def __init__(self, text, translation):
+        self.text = text
+        self.translation = translation
+
+
+class Definition:
+    __slots__ = ('text', 'examples')
+
+    def __init__(self, text, examples=()):
+        self.text = text
+        self.examples = examples
+
+
+class Entry:
+    """What a card keeps of a dictionary entry: enough to export it, nothing tying it to the parser."""
+
+    __slots__ = ('word', 'part_of_speech', 'definitions', 'audio_links')
+
+    def __init__(self, word, part_of_speech, definitions=(), audio_links=()):
+        self.word = word
+        # a handful of distinct values across a whole batch
+        self.part_of_speech = sys.intern(part_of_speech) if part_of_speech else ''
+        self.definitions = definitions
+        self.audio_links = audio_links
+
+    def __str__(self):
+        self_str = f"{self.word}: {self.part_of_speech}\n"
+        for i, definition in enumerate(self.definitions):
+            self_str += f"\t{i + 1}. {definition.text}\n"
+            for example in definition.examples:
+                self_str += f"\t\t{example.text} - {example.translation}\n"
+        return self_str
+
+
+def compact_entry(entry):
+    """Copy a parser's entry (wiktionary, dump or manual) into an Entry, dropping everything export does not use."""
+    if isinstance(entry, Entry):
+        return entry
+    definitions = tuple(
+        Definition(definition.text,
+                   tuple(Example(example.text, example.translation) for example in definition.examples))
+        for definition in entry.definitions)
+    return Entry(entry.word, entry.part_of_speech, definitions, tuple(entry.audio_links or ()))
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import threading
+
+try:
+    from .normalize import normalize
+except ImportError:
+    from normalize import normalize
+
+_LOG = logging.getLogger(__name__)
+
+
+def _first(card):
+    return 0
+
+
+def _most_definitions(card):
+    counts = [len(entry.definitions) for entry in card.entries]
+    return counts.index(max(counts))
+
+
+# ways to pick an entry for an ambiguous word when nobody is there to choose
+TIE_BREAKERS = {'first': _first, 'most_definitions': _most_definitions}
+
+
+class ChoiceStore:
+    """Which entry was picked for an ambiguous word, per language, kept on disk so the word is not asked again."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._choices = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._choices = json.load(f)
+
+    def lookup(self, language, card):
+        """Index of the entry remembered for card, or None if it was never chosen or that entry is gone."""
+        with self._lock:
+            headword = self._choices.get(language, {}).get(normalize(card.entered_word, language))
+        if headword is None:
+            return None
+        # entries of a card have distinct headwords, so that is enough to find the one chosen last time
+        return next((i for i, entry in enumerate(card.entries) if entry.word == headword), None)
+
+    def remember(self, language, card, choice):
+        with self._lock:
+            self._choices.setdefault(language, {})[normalize(card.entered_word, language)] = \
+                card.entries[choice].word
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._choices, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(words) for words in self._choices.values())
+
+
+class Chooser:
+    """Settles ambiguous cards from remembered choices, then the tie-breaker if there is one, else leaves them."""
+
+    def __init__(self, language, store=None, tie_breaker=None):
+        if tie_breaker and tie_breaker not in TIE_BREAKERS:
+            raise ValueError(f"Unknown tie-breaker {tie_breaker}")
+        self.language = language
+        self.store = store
+        self.tie_breaker = TIE_BREAKERS[tie_breaker] if tie_breaker else None
+        self.remembered = 0
+        self.broken = 0
+
+    def choose(self, card):
+        """Select an entry on card and return True, or return False if it needs a person."""
+        choice = None if self.store is None else self.store.lookup(self._language(card), card)
+        if choice is not None:
+            self.remembered += 1
+        elif self.tie_breaker is not None:
+            choice = self.tie_breaker(card)
+            self.broken += 1
+        else:
+            return False
+        card.select_entry(choice)
+        return True
+
+    def chosen(self, cards, choices, remember=True):
+        """Apply choices made on the review screen, one per card."""
+        for card, choice in zip(cards, choices):
+            card.select_entry(choice)
+            if remember and self.store is not None:
+                self.store.remember(self._language(card), card, choice)
+        if remember and self.store is not None and cards:
+            self.store.save()
+
+    def _language(self, card):
+        # a mixed language batch has one chooser for all of its cards
+        return getattr(card, 'language', None) or self.language
+
+    def stats(self):
+        return {'remembered': self.remembered, 'tie_broken': self.broken}
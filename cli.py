@@ -0,0 +1,261 @@
+import argparse
+import collections
+import json
+import logging
+import os
+import sys
+import time
+
+# same vendored packages as the add-on, without going through __init__ (which needs Anki and Qt)
+folder = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(folder, "vendor"))
+
+try:
+    from .builddeck import get_deck, DeckSet
+    from .flashcard import Flashcard
+    from .wordpool import WordPool
+    from .choices import ChoiceStore, Chooser, TIE_BREAKERS
+    from .journal import JobJournal
+    from . import journal
+    from .audiostage import AudioStage
+    from .wikicache import ParserCache
+    from .audiostore import AudioStore
+    from .inflindex import InflectionIndex
+    from .pipeline import CardMaker, CardRouter, LANGUAGE_CODES, tagged_words
+    from .knownwords import KnownWords
+    from .forvoquota import ForvoBudget, DeferredQueue, ForvoScheduler
+    from .metrics import get_metrics
+    from .audioprocess import AudioProcessor, AudioSettings
+    from .cancel import CancelToken, Cancelled, scope
+    from . import httpclient, resilience
+except ImportError:
+    from builddeck import get_deck, DeckSet
+    from flashcard import Flashcard
+    from wordpool import WordPool
+    from choices import ChoiceStore, Chooser, TIE_BREAKERS
+    from journal import JobJournal
+    import journal
+    from audiostage import AudioStage
+    from wikicache import ParserCache
+    from audiostore import AudioStore
+    from inflindex import InflectionIndex
+    from pipeline import CardMaker, CardRouter, LANGUAGE_CODES, tagged_words
+    from knownwords import KnownWords
+    from forvoquota import ForvoBudget, DeferredQueue, ForvoScheduler
+    from metrics import get_metrics
+    from audioprocess import AudioProcessor, AudioSettings
+    from cancel import CancelToken, Cancelled, scope
+    import httpclient
+    import resilience
+
+_LOG = logging.getLogger('cli')
+
+
+def read_words(file_name):
+    with open(file_name, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_package(words, language, out_file, num_workers=4, data_dir=None, media_dir=None, dictionary=None,
+                  offline=False, stream=False, shard_mb=None, known_packages=(), forvo_limit=500,
+                  audio_settings=None, tie_breaker='first', resume=True):
+    """Run the whole fetch/audio/deck pipeline for words and write out_file. Returns the run report.
+
+    Words tagged with another language than language (see pipeline.tagged_words) go to a package of their own
+    next to out_file.
+    """
+    start = time.perf_counter()
+    get_metrics().reset()
+    data_dir = os.path.join(folder, 'user_files') if data_dir is None else data_dir
+    media_dir = os.path.splitext(out_file)[0] + '_media' if media_dir is None else media_dir
+
+    httpclient.configure(pool_size=num_workers)
+    Flashcard.media_dir = media_dir
+    Flashcard.audio_store = AudioStore(os.path.join(data_dir, 'audio'))
+    Flashcard.audio_processor = None
+    if audio_settings is not None:
+        Flashcard.audio_processor = AudioProcessor(audio_settings, Flashcard.audio_store, num_workers,
+                                                   os.path.join(folder, 'vendor'))
+    cache = ParserCache(os.path.join(data_dir, 'wiktionary_cache.sqlite'), offline=offline)
+    scheduler = ForvoScheduler(ForvoBudget(os.path.join(data_dir, 'forvo_budget.json'), forvo_limit),
+                               DeferredQueue(os.path.join(data_dir, 'forvo_deferred.jsonl')))
+
+    def card_maker(maker_language):
+        inflections = InflectionIndex(os.path.join(data_dir, f'inflections_{maker_language}.sqlite'), maker_language)
+        # the dictionary store is built for one language, the others are looked up on wiktionary
+        return CardMaker(maker_language, LANGUAGE_CODES[maker_language], cache, inflections,
+                         dictionary if maker_language == language else None, scheduler)
+
+    maker = CardRouter(language, card_maker)
+    # nobody to ask, so words not chosen on an earlier run in the add-on go to the tie-breaker
+    chooser = Chooser(language, ChoiceStore(os.path.join(data_dir, 'choices.json')), tie_breaker)
+
+    words = tagged_words(words, language)
+    job = JobJournal.for_job(os.path.join(data_dir, 'jobs'), language, words)
+    if not resume:
+        job.clear()
+    deck = DeckSet(language)
+    if stream or shard_mb:
+        deck.stream_to(out_file, shard_mb)
+    report = {'language': language, 'words': len(words), 'cards': 0, 'not_found': [], 'failed': [], 'ambiguous': [],
+              'review': [], 'known': [], 'cancelled': False, 'resumed': 0}
+    for package in known_packages:
+        words, known = maker.filter_known(
+            words, lambda known_language: KnownWords.from_apkg(package, get_deck(known_language), known_language))
+        report['known'].extend(known)
+    token = CancelToken()
+    audio = AudioStage(num_workers, token)
+    # cards wait here for their audio, and go into the deck in input order once it is there
+    waiting = collections.deque()
+    per_language = collections.Counter()
+
+    def add_ready(limit):
+        while waiting and (waiting[0][1].done() or len(waiting) > limit):
+            card, future, record = waiting.popleft()
+            future.result()
+            if record:
+                job.record(maker.key(card), journal.CARD, card, not token.cancelled)
+            deck.add_flashcard(card)
+            report['cards'] += 1
+            per_language[card.language or language] += 1
+
+    # words done on an earlier, interrupted run of the same list
+    outcomes = job.outcomes()
+    remaining = []
+    for word in words:
+        item = outcomes.get(word)
+        if item is None or item['status'] not in journal.DONE:
+            remaining.append(word)
+        elif item['status'] == journal.NOT_FOUND:
+            report['not_found'].append(word)
+        else:
+            card = job.restore(item)
+            report['resumed'] += 1
+            if card.chosen_entry is None and not chooser.choose(card):
+                report['review'].append(word)
+                continue
+            waiting.append((card, audio.submit(card), item['status'] != journal.CARD))
+    if report['resumed']:
+        _LOG.info('Resuming, %d of %d words were done on an earlier run', len(words) - len(remaining), len(words))
+    words = remaining
+
+    def make_card(index, word):
+        try:
+            with scope(token):
+                return maker.make(word)
+        except Cancelled:
+            return None
+        except Exception as e:
+            if not resilience.is_transient(e):
+                raise
+            _LOG.warning('Looking up %s failed: %s', word, e)
+            return None
+
+    cards = WordPool(make_card, num_workers).map(words)
+    try:
+        for i, word, card in cards:
+            if card is None:
+                report['failed'].append(word)
+                continue
+            if len(card.entries) == 0:
+                job.record(word, journal.NOT_FOUND)
+                report['not_found'].append(word)
+                continue
+            if len(card.entries) > 1:
+                chosen = chooser.choose(card)
+                report['ambiguous'].append({'word': word, 'entries': [entry.word for entry in card.entries],
+                                            'chosen': card.word if chosen else None})
+                if not chosen:
+                    # nobody to ask without a tie-breaker, the word waits in the journal like one for the review screen
+                    job.record(word, journal.REVIEW, card)
+                    report['review'].append(word)
+                    continue
+            waiting.append((card, audio.submit(card), True))
+            add_ready(num_workers * 4)
+            _LOG.info('%d/%d %s', i + 1, len(words), word)
+    except KeyboardInterrupt:
+        # Ctrl-C aborts the lookups and downloads in flight, the cards made so far still go into the package
+        _LOG.warning('Cancelled, writing out the cards made so far')
+        report['cancelled'] = True
+        token.cancel()
+        cards.close()
+    maker.finish()
+    add_ready(0)
+    audio.shutdown()
+    if Flashcard.audio_processor is not None:
+        Flashcard.audio_processor.shutdown()
+
+    report['output'] = deck.export(out_file)
+    # words left for review keep the journal, a later run or the add-on picks them up from there
+    if not report['cancelled'] and not report['review']:
+        job.clear()
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    report['http'] = httpclient.get_client().stats()
+    report['network'] = resilience.get_resilience().stats()
+    report['cache'] = cache.stats()
+    report['audio'] = Flashcard.audio_store.stats()
+    report['forvo'] = {'remaining': scheduler.budget.remaining, 'deferred': scheduler.deferred}
+    report['lemmas'] = maker.lemma_stats()
+    if len(per_language) > 1:
+        report['languages'] = dict(per_language)
+    report['choices'] = chooser.stats()
+    if Flashcard.audio_processor is not None:
+        report['audio_processing'] = Flashcard.audio_processor.stats()
+    report['stages'] = get_metrics().stages()
+    return report
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Build an Anki .apkg from a word list without Anki')
+    arg_parser.add_argument('words', help='Text file with one word per line')
+    arg_parser.add_argument('-l', '--language', default='Russian', choices=sorted(LANGUAGE_CODES))
+    arg_parser.add_argument('-o', '--out', default='output.apkg', help='Package to write')
+    arg_parser.add_argument('-r', '--report', help='JSON report to write, defaults to <out>.json')
+    arg_parser.add_argument('-j', '--workers', type=int, default=4, help='Words looked up at the same time')
+    arg_parser.add_argument('--data-dir', help='Where caches are kept, defaults to the add-on user_files folder')
+    arg_parser.add_argument('--media-dir', help='Where audio for the package is put, defaults to <out>_media')
+    arg_parser.add_argument('--dictionary', help='Local dictionary store to use instead of wiktionary')
+    arg_parser.add_argument('--offline', action='store_true', help='Only use cached wiktionary lookups')
+    arg_parser.add_argument('--stream', action='store_true', help='Write notes to the package as they are found')
+    arg_parser.add_argument('--shard-mb', type=float, help='Split the package into files of at most this size')
+    arg_parser.add_argument('--skip-known', action='append', default=[], metavar='APKG',
+                            help='Skip words that already have a note in this package (can be repeated)')
+    arg_parser.add_argument('--forvo-key', default=os.getenv('FORVO_API_KEY'), help='Forvo API key')
+    arg_parser.add_argument('--forvo-limit', type=int, default=500, help='Forvo requests allowed per day')
+    arg_parser.add_argument('--process-audio', action='store_true',
+                            help='Trim silence, level loudness and re-encode audio (needs pydub and ffmpeg)')
+    arg_parser.add_argument('--audio-format', default='mp3', choices=['mp3', 'ogg'])
+    arg_parser.add_argument('--audio-bitrate', default='64k')
+    arg_parser.add_argument('--choose', default='first', choices=sorted(TIE_BREAKERS),
+                            help='Entry to take for words with several, unless one was chosen before')
+    arg_parser.add_argument('--fresh', action='store_true',
+                            help='Start over instead of resuming an interrupted run of the same list')
+    arg_parser.add_argument('-v', '--verbose', action='store_true')
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.forvo_key:
+        os.environ['FORVO_API_KEY'] = args.forvo_key
+
+    audio_settings = None
+    if args.process_audio:
+        audio_settings = AudioSettings(format=args.audio_format, bitrate=args.audio_bitrate)
+    words = read_words(args.words)
+    try:
+        tagged_words(words, args.language)
+    except ValueError as e:
+        arg_parser.error(f'{args.words}: {e}')
+    report = build_package(words, args.language, args.out, args.workers, args.data_dir,
+                           args.media_dir, args.dictionary, args.offline, args.stream, args.shard_mb,
+                           args.skip_known, args.forvo_limit, audio_settings, args.choose, not args.fresh)
+    report_file = args.report or os.path.splitext(args.out)[0] + '.json'
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    _LOG.info('%d cards written to %s, %d words not found, %d failed to look up, %d need an entry chosen (see %s)',
+              report['cards'], ', '.join(report['output']), len(report['not_found']), len(report['failed']),
+              len(report['review']), report_file)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
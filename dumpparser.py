@@ -0,0 +1,220 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import urllib.parse
+import zlib
+
+try:
+    from .normalize import normalize
+except ImportError:
+    from normalize import normalize
+
+_LOG = logging.getLogger(__name__)
+
+URL_PREFIX = 'dump://'
+BATCH_SIZE = 1000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, word TEXT NOT NULL, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS headwords (key TEXT NOT NULL, entry_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS forms (key TEXT NOT NULL, entry_id INTEGER NOT NULL);
+'''
+
+_INDEXES = '''
+CREATE INDEX IF NOT EXISTS entries_word ON entries (word);
+CREATE INDEX IF NOT EXISTS headwords_key ON headwords (key);
+CREATE INDEX IF NOT EXISTS forms_key ON forms (key);
+'''
+
+
+class DumpExample:
+    def __init__(self, text, translation):
+        self.text = text
+        self.translation = translation
+
+
+class DumpDefinition:
+    def __init__(self, word, text, examples):
+        self.base_word = word
+        self.base_link = None
+        self.text = text
+        self.examples = examples
+
+
+class DumpInflections:
+    def __init__(self, forms):
+        self.forms = forms
+
+    def to_lower_set(self):
+        return set(form.lower() for form in self.forms)
+
+
+class DumpEntry:
+    def __init__(self, parser, word, data):
+        self._parser = parser
+        self.word = word
+        self.language = parser.language
+        self.part_of_speech = data['pos']
+        self.definitions = [
+            DumpDefinition(word, sense['text'], [DumpExample(text, translation) for text, translation in sense['examples']])
+            for sense in data['senses']
+        ]
+        self.inflections = DumpInflections(data['forms']) if data['forms'] else None
+        self.audio_links = data['audio']
+        self.base_links = data['form_of']
+        self.base_links_set = set(self.base_links)
+        self.tracing = []
+
+    def follow_to_base(self):
+        base_entries = []
+        for link in self.base_links:
+            base_entries.extend(self._parser.fetch(link))
+        return base_entries
+
+    def __str__(self):
+        self_str = f"{self.word}: {self.part_of_speech}\n"
+        for i, definition in enumerate(self.definitions):
+            self_str += f"\t{i + 1}. {definition.text}\n"
+            for example in definition.examples:
+                self_str += f"\t\t{example.text} - {example.translation}\n"
+        return self_str
+
+
+class DumpParser:
+    """Same fetch/search/fetch_from_url interface as WiktionaryParser, answered from a local store."""
+
+    def __init__(self, language, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Dictionary store {path} does not exist")
+        self.language = language
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(f'file:{urllib.parse.quote(self.path)}?mode=ro', uri=True)
+        return db
+
+    def fetch(self, word):
+        rows = self._db.execute('SELECT word, data FROM entries WHERE word = ? ORDER BY id', (word,)).fetchall()
+        return [self._entry(word, data) for word, data in rows]
+
+    def fetch_from_url(self, url):
+        if url.startswith(URL_PREFIX):
+            url = url[len(URL_PREFIX):]
+        return self.fetch(urllib.parse.unquote(url))
+
+    def search(self, word, limit=10):
+        """Opensearch style result like wiktionary's: [query, titles, descriptions, urls]."""
+        key = normalize(word, self.language)
+        rows = self._db.execute(
+            'SELECT DISTINCT entries.word FROM headwords JOIN entries ON entries.id = headwords.entry_id '
+            'WHERE headwords.key = ? '
+            'UNION ALL '
+            'SELECT DISTINCT entries.word FROM forms JOIN entries ON entries.id = forms.entry_id '
+            'WHERE forms.key = ? LIMIT ?', (key, key, limit)).fetchall()
+        titles = []
+        for title, in rows:
+            if title not in titles:
+                titles.append(title)
+        return [word, titles, [''] * len(titles), [URL_PREFIX + urllib.parse.quote(title) for title in titles]]
+
+    def _entry(self, word, data):
+        return DumpEntry(self, word, json.loads(zlib.decompress(data)))
+
+
+def _open_dump(dump_path):
+    if dump_path.endswith('.gz'):
+        return gzip.open(dump_path, 'rt', encoding='utf-8')
+    return open(dump_path, 'r', encoding='utf-8')
+
+
+def _convert(raw):
+    """Keep only what a card needs from a wiktextract (kaikki.org) JSONL record."""
+    senses = []
+    form_of = []
+    for sense in raw.get('senses', []):
+        glosses = sense.get('glosses') or sense.get('raw_glosses')
+        if not glosses:
+            continue
+        examples = [(example.get('text', ''), example.get('english') or example.get('translation') or '')
+                    for example in sense.get('examples', []) if example.get('text')]
+        senses.append({'text': '; '.join(glosses), 'examples': examples})
+        for base in sense.get('form_of', []) + sense.get('alt_of', []):
+            if base.get('word') and base['word'] not in form_of:
+                form_of.append(base['word'])
+    forms = []
+    for form in raw.get('forms', []):
+        text = form.get('form', '')
+        if text and text != '-' and 'table-tags' not in form.get('tags', []) and text not in forms:
+            forms.append(text)
+    audio = [sound[key] for sound in raw.get('sounds', []) for key in ('mp3_url', 'ogg_url') if sound.get(key)]
+    return {
+        'pos': raw.get('pos', '').capitalize(),
+        'senses': senses,
+        'forms': forms,
+        'audio': audio[:1],
+        'form_of': form_of,
+    }
+
+
+def build_store(dump_path, language, path):
+    """Stream a JSONL dump into a store at path, holding at most BATCH_SIZE entries in memory."""
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    db.executescript(_SCHEMA)
+    db.execute('INSERT INTO meta VALUES (?, ?)', ('language', language))
+    count = 0
+    entries, headwords, forms = [], [], []
+
+    def write_batch():
+        db.executemany('INSERT INTO entries VALUES (?, ?, ?)', entries)
+        db.executemany('INSERT INTO headwords VALUES (?, ?)', headwords)
+        db.executemany('INSERT INTO forms VALUES (?, ?)', forms)
+        db.commit()
+        entries.clear()
+        headwords.clear()
+        forms.clear()
+
+    with _open_dump(dump_path) as dump:
+        for line in dump:
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            if raw.get('lang') != language or not raw.get('word'):
+                continue
+            data = _convert(raw)
+            if not data['senses']:
+                continue
+            count += 1
+            entries.append((count, raw['word'], zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'))))
+            headwords.append((normalize(raw['word'], language), count))
+            forms.extend((key, count) for key in {normalize(form, language) for form in data['forms']})
+            if len(entries) >= BATCH_SIZE:
+                write_batch()
+    write_batch()
+    db.executescript(_INDEXES)
+    db.execute('VACUUM')
+    db.close()
+    os.replace(tmp_path, path)
+    _LOG.info('Stored %d %s entries in %s', count, language, path)
+    return count
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    arg_parser = argparse.ArgumentParser(description='Build a local dictionary store from a wiktextract JSONL dump')
+    arg_parser.add_argument('dump', help='JSONL dump, optionally gzipped, e.g. from kaikki.org')
+    arg_parser.add_argument('language', help='Language name as used in the dump, e.g. Russian')
+    arg_parser.add_argument('out', help='Store file to write')
+    args = arg_parser.parse_args()
+    build_store(args.dump, args.language, args.out)
@@ -1,47 +1,115 @@
 import logging
 import os
 
+try:
+    from .audiostore import download, normalize_url, url_file_name
+    from .normalize import normalize, entry_keys
+    from .lemmas import LemmaGraph
+    from .metrics import timer
+    from .resilience import TransientError
+    from .cardmodel import compact_entry
+except ImportError:
+    from audiostore import download, normalize_url, url_file_name
+    from normalize import normalize, entry_keys
+    from lemmas import LemmaGraph
+    from metrics import timer
+    from resilience import TransientError
+    from cardmodel import compact_entry
+
 _LOG = logging.getLogger(__name__)
 
 
 class Flashcard(object):
+    # a long batch keeps every card until export, so a card holds only what export needs and a reference to the
+    # maker's shared forvo parser, never a parser of its own
+    __slots__ = ('entered_word', 'word', 'language', 'chosen_entry', '_base_entries', '_audio_parser', '_audio_file',
+                 'audio_ready', 'audio_failed', '_html')
+
     media_dir = '.'
+    audio_store = None
+    audio_processor = None
 
-    def __init__(self, entered_word, parser, audio_parser=None):
-        self.logger = logging.getLogger(f"Flashcard_{entered_word}")
-        self._parser = parser
-        self._audio_parser = audio_parser
+    def __init__(self, entered_word, parser, audio_parser=None, lemmas=None, inflections=None):
+        self._start(entered_word, getattr(parser, 'language', None), audio_parser)
 
-        self.entered_word = entered_word
-        self._audio_file = None
-        self.chosen_entry = None
+        with timer('fetch'):
+            entries = parser.fetch(entered_word)
 
-        entries = self._parser.fetch(entered_word)
+        if not entries and inflections is not None:
+            with timer('index'):
+                entries = _entries_from_index(parser, inflections, entered_word)
 
         if not entries:
-            self.logger.debug('Using search function to find entries')
-            entries = self._get_entries_from_search(entries, entered_word)
+            _LOG.debug('Using search function to find entries for %s', entered_word)
+            with timer('search'):
+                entries = _entries_from_search(parser, entries, entered_word)
 
-        followed_entries = self._follow_entries_to_base(entries, 0)
+        with timer('follow_to_base'):
+            followed_entries = (LemmaGraph() if lemmas is None else lemmas).resolve(entries)
+        base_entries = []
         word_list = []
-        self._base_entries = []
         for entry in followed_entries:
             if entry.word not in word_list:
-                self._base_entries.append(entry)
+                base_entries.append(entry)
                 word_list.append(entry.word)
 
+        if inflections is not None:
+            for entry in entries + base_entries:
+                inflections.add_entry(entry)
+
+        self._set_entries(base_entries)
+
+    @classmethod
+    def restored(cls, entered_word, entries, language=None, audio_parser=None):
+        """A card from entries looked up on an earlier run, made without looking (or timing) anything again."""
+        card = cls.__new__(cls)
+        card._start(entered_word, language, audio_parser)
+        card._set_entries(entries)
+        return card
+
+    def _start(self, entered_word, language, audio_parser):
+        self._audio_parser = audio_parser
+        self.entered_word = entered_word
+        self.language = language
+        self._audio_file = None
+        self.audio_ready = False
+        self.audio_failed = False
+        self.chosen_entry = None
+
+    def _set_entries(self, entries):
+        self._base_entries = tuple(compact_entry(entry) for entry in entries)
         if len(self._base_entries) == 1:
             self.chosen_entry = self._base_entries[0]
             self._parse_chosen_entry()
 
     def _parse_chosen_entry(self):
         self.word = self.chosen_entry.word
-        if self.chosen_entry.audio_links:
-            self.logger.info('Downloading audio from wiktionary')
-            self._download_file(self.chosen_entry.audio_links[0])
-        if self._audio_file is None and self._audio_parser is not None:
-            self.logger.info('Checking Forvo for pronunciations')
-            self._audio_file = self._audio_parser.download(self.chosen_entry.word, Flashcard.media_dir)
+
+    def fetch_audio(self):
+        # kept out of __init__ so the definitions are ready before any audio is downloaded, see AudioStage
+        if self.chosen_entry is None or self.audio_ready:
+            return self.audio_file
+        try:
+            if self.chosen_entry.audio_links:
+                _LOG.info('Downloading audio for %s from wiktionary', self.entered_word)
+                with timer('audio_download'):
+                    self._download_file(self.chosen_entry.audio_links[0])
+            if self._audio_file is None and self._audio_parser is not None:
+                _LOG.info('Checking Forvo for pronunciations of %s', self.entered_word)
+                try:
+                    self._audio_file = self._audio_parser.download(self.chosen_entry.word, Flashcard.media_dir,
+                                                                   self.chosen_entry.part_of_speech)
+                except TransientError:
+                    _LOG.warning('Forvo lookup for %s failed', self.entered_word, exc_info=True)
+                    self.audio_failed = True
+            if self._audio_file is not None:
+                self.audio_failed = False
+                if Flashcard.audio_processor is not None:
+                    self._audio_file = Flashcard.audio_processor.process(self._audio_file)
+        finally:
+            # also when cancelled, the card is kept as it is
+            self.audio_ready = True
+        return self.audio_file
 
     @property
     def front(self):
@@ -80,76 +148,74 @@ class Flashcard(object):
                     self_str += f"\t\t* {example.text}\n"
         return self_str
 
-    def _follow_entries_to_base(self, entries, recursion_level):
-        if recursion_level > 3:
-            # raise Exception('Greater than 10 levels of recursion reached trying to follow entry to base word')
-            return entries
-        base_entries = []
-        for entry in entries:
-            followed_entries = entry.follow_to_base()
-            if followed_entries:
-                base_entries.extend(self._follow_entries_to_base(followed_entries, recursion_level + 1))
-            else:
-                base_entries.append(entry)
-        return base_entries
-
-    def _get_entries_from_search(self, entries, word):
-        search_results = self._parser.search(word)
-        match = check_for_match(search_results, word)
-        if match is not None:
-            entries = self._parser.fetch(match)
-            if not entries:
-                entries = self._parser.fetch(match.lower())
+    def _download_file(self, link):
+        link = normalize_url(link)
+        out_file = os.path.join(Flashcard.media_dir, url_file_name(link))
+        try:
+            if Flashcard.audio_store is not None:
+                self._audio_file = Flashcard.audio_store.fetch(link, out_file)
             else:
-                for entry in entries:
-                    entry.tracing.append(f'Found word from search {match}')
-        else:
-            if len(search_results[1]) > 0:  # wiki returned some suggestions
-                max_checks = 3
-                for possible_entry in search_results[3][0:max_checks]:
-                    possible_entries = self._parser.fetch_from_url(possible_entry)  # fetch the first suggestion
-                    stripped_word = word.lower().replace('́', '')
-                    for entry in possible_entries:
-                        if entry.inflections is not None:
-                            inflection_set = entry.inflections.to_lower_set()
-                            for inflection in inflection_set:
-                                if stripped_word == inflection.lower().replace('́', '').replace('ё', 'е'):
-                                    print("Found word in inflections table for %s ->" % entry.word, end=' ')
-                                    entries = [entry]
-                                    break
-                            else:
-                                continue
-                            break
-                        else:
-                            if stripped_word == entry.word.lower().replace('́', '').replace('ё', 'е'):
-                                entries = [entry]
-                                entries[0].tracing.append(f"Used search to find word {entry.word}")
-                                break
-        return entries
+                self._audio_file = download(link, out_file)
+        except OSError as e:
+            _LOG.error('Error downloading audio %s', link, exc_info=True)
+            self.audio_failed = isinstance(e, TransientError)
 
-    def _download_file(self, link):
-        if not os.path.exists(Flashcard.media_dir):
-            os.mkdir(Flashcard.media_dir)
-        self._audio_file = self._parser.download_audio(link, Flashcard.media_dir)
+    def set_audio_file(self, audio_file):
+        """Audio found on an earlier run, so fetch_audio has nothing left to do."""
+        self._audio_file = audio_file or None
+        self.audio_ready = True
 
     def select_entry(self, choice_num):
         self.chosen_entry = self._base_entries[choice_num]
         self._parse_chosen_entry()
 
 
-def check_for_match(search_results, entered_word):
-    match = None
-    suggestions = search_results[1]
-    for suggestion in suggestions:
-        if entered_word == suggestion.replace('ё', 'е'):
-            _LOG.debug('ё match found. Replacing %s with %s', entered_word, suggestion)
-            match = suggestion
-            break
-        elif entered_word.lower() == suggestion.lower():
-            _LOG.debug('Capitalization issue. Replacing %s with %s', entered_word, suggestion)
-            match = suggestion
-            break
-    return match
+def _entries_from_index(parser, inflections, word):
+    language = getattr(parser, 'language', None)
+    key = normalize(word, language)
+    entries = []
+    for lemma in inflections.lookup(word):
+        entries.extend(e for e in parser.fetch(lemma) if key in entry_keys(e, language))
+    if entries:
+        _LOG.debug('Found %s in the inflection index', word)
+        for entry in entries:
+            entry.tracing.append(f"Used inflection index to find word {entry.word}")
+    return entries
+
+
+def _entries_from_search(parser, entries, word):
+    language = getattr(parser, 'language', None)
+    search_results = parser.search(word)
+    match = check_for_match(search_results, word, language)
+    if match is not None:
+        entries = parser.fetch(match)
+        if not entries:
+            entries = parser.fetch(match.lower())
+        else:
+            for entry in entries:
+                entry.tracing.append(f'Found word from search {match}')
+    else:
+        if len(search_results[1]) > 0:  # wiki returned some suggestions
+            max_checks = 3
+            key = normalize(word, language)
+            for possible_entry in search_results[3][0:max_checks]:
+                possible_entries = parser.fetch_from_url(possible_entry)  # fetch the first suggestion
+                entry = next((e for e in possible_entries if key in entry_keys(e, language)), None)
+                if entry is not None:
+                    _LOG.debug('Found word in inflections table for %s', entry.word)
+                    entry.tracing.append(f"Used search to find word {entry.word}")
+                    entries = [entry]
+                    break
+    return entries
+
+
+def check_for_match(search_results, entered_word, language=None):
+    key = normalize(entered_word, language)
+    for suggestion in search_results[1]:
+        if key == normalize(suggestion, language):
+            _LOG.debug('Normalized match found. Replacing %s with %s', entered_word, suggestion)
+            return suggestion
+    return None
 
 
 if __name__ == '__main__':
@@ -0,0 +1,186 @@
+import datetime
+import json
+import logging
+import os
+import threading
+
+try:
+    from .resilience import TransientError
+except ImportError:
+    from resilience import TransientError
+
+_LOG = logging.getLogger(__name__)
+
+
+def _today():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def _write_json_atomic(path, data):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class ForvoBudget:
+    """Number of Forvo API requests made today, kept on disk so it carries over between runs."""
+
+    def __init__(self, path, daily_limit=500):
+        self.path = path
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        self._date = _today()
+        self._count = 0
+        self._exhausted = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('date') == self._date:
+                self._count = data.get('count', 0)
+                self._exhausted = data.get('exhausted', False)
+
+    def _roll_over(self):
+        if self._date != _today():
+            self._date, self._count, self._exhausted = _today(), 0, False
+
+    def _save(self):
+        _write_json_atomic(self.path, {'date': self._date, 'count': self._count, 'exhausted': self._exhausted})
+
+    def acquire(self):
+        with self._lock:
+            self._roll_over()
+            if self._exhausted or self._count >= self.daily_limit:
+                return False
+            self._count += 1
+            self._save()
+            return True
+
+    def exhaust(self):
+        """Forvo said the limit is reached, whatever our own count says."""
+        with self._lock:
+            self._roll_over()
+            self._exhausted = True
+            self._save()
+
+    @property
+    def remaining(self):
+        with self._lock:
+            self._roll_over()
+            return 0 if self._exhausted else max(0, self.daily_limit - self._count)
+
+
+class DeferredQueue:
+    """Words that did not get Forvo audio because of the daily limit, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, word, language_code, part_of_speech=''):
+        item = {'word': word, 'language_code': language_code, 'part_of_speech': part_of_speech}
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def items(self):
+        with self._lock:
+            return self._read()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        items = []
+        seen = set()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                key = (item['word'], item['language_code'], item['part_of_speech'])
+                if key not in seen:
+                    seen.add(key)
+                    items.append(item)
+        return items
+
+    def remove(self, done):
+        done = {(item['word'], item['language_code'], item['part_of_speech']) for item in done}
+        with self._lock:
+            remaining = [item for item in self._read()
+                         if (item['word'], item['language_code'], item['part_of_speech']) not in done]
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(item, ensure_ascii=False) + '\n' for item in remaining)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.items())
+
+
+class ForvoScheduler:
+    def __init__(self, budget, queue):
+        self.budget = budget
+        self.queue = queue
+        self.deferred = 0
+
+    def acquire(self):
+        return self.budget.acquire()
+
+    def defer(self, word, language_code, part_of_speech=''):
+        _LOG.info('Forvo daily limit reached, deferring %s', word)
+        self.deferred += 1
+        self.queue.add(word, language_code, part_of_speech)
+
+    def limit_reached(self):
+        self.budget.exhaust()
+
+    def download_deferred(self, make_parser, out_dir):
+        """Fetch audio for queued words while budget lasts. Returns [(item, audio file)] for the words that got some."""
+        found = []
+        missing = []
+        for item in self.queue.items():
+            if self.budget.remaining == 0:
+                break
+            deferred = self.deferred
+            try:
+                audio_file = make_parser(item['language_code']).download(item['word'], out_dir,
+                                                                         item['part_of_speech'])
+            except TransientError as e:
+                # stays queued for the next start
+                _LOG.warning('Forvo backfill of %s failed: %s', item['word'], e)
+                continue
+            if audio_file is not None:
+                found.append((item, audio_file))
+            elif self.deferred == deferred:
+                # forvo has nothing for it, asking again tomorrow will not help
+                missing.append(item)
+        self.queue.remove(missing)
+        return found
+
+
+def apply_to_collection(col, found, deck_for_code, queue):
+    """Put backfilled audio into notes created earlier, found by their stable GUID."""
+    done = []
+    for item, audio_file in found:
+        deck = deck_for_code(item['language_code'])
+        guid = deck.note_guid(item['word'], item['part_of_speech'])
+        note_id = col.db.scalar('SELECT id FROM notes WHERE guid = ?', guid)
+        if note_id is None:
+            _LOG.debug('No note for %s yet, keeping it queued', item['word'])
+            continue
+        note = col.get_note(note_id) if hasattr(col, 'get_note') else col.getNote(note_id)
+        if not note['Audio']:
+            note['Audio'] = f"[sound:{col.media.add_file(audio_file)}]"
+            if hasattr(col, 'update_note'):
+                col.update_note(note)
+            else:
+                note.flush()
+        done.append(item)
+    queue.remove(done)
+    return len(done)
@@ -0,0 +1,281 @@
+import collections
+import http.client
+import logging
+import socket
+import threading
+import urllib.parse
+import zlib
+
+try:
+    from .resilience import get_resilience
+    from . import cancel
+except ImportError:
+    from resilience import get_resilience
+    import cancel
+
+_LOG = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 6.1; Win64; x64)'
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+# errors that mean a kept-alive connection was closed by the server while it sat in the pool
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                 ConnectionAbortedError, BrokenPipeError)
+
+
+class HTTPStatusError(OSError):
+    def __init__(self, url, status, body=b''):
+        super().__init__(f'HTTP {status} for {url}')
+        self.url = url
+        self.status = status
+        self.body = body
+
+
+def _abort(sock):
+    # shutting the socket down wakes up a thread blocked reading from it, closing it alone does not
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Response:
+    """File-like response body. The connection goes back to its pool once the body is read or closed."""
+
+    def __init__(self, client, key, conn, raw, url, token=None, unregister=None):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._raw = raw
+        self._token = token
+        self._unregister = unregister
+        self.url = url
+        self.status = raw.status
+        self.headers = raw.headers
+        self._decoder = None
+        if (raw.getheader('Content-Encoding') or '').lower() == 'gzip':
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._buffer = b''
+        self._done = False
+
+    def read(self, size=-1):
+        try:
+            data = self._read(size)
+        except Exception:
+            self._check_cancelled()
+            raise
+        # an aborted read can also look like the end of the body
+        self._check_cancelled()
+        return data
+
+    def _check_cancelled(self):
+        if self._token is not None and self._token.cancelled:
+            self.close()
+            raise cancel.Cancelled()
+
+    def _read(self, size):
+        if self._decoder is None:
+            data = self._raw.read() if size is None or size < 0 else self._raw.read(size)
+            self._client._count_bytes(len(data))
+            if size is None or size < 0 or not data:
+                self.close()
+            return data
+
+        while not self._done and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._raw.read(64 * 1024)
+            self._client._count_bytes(len(chunk))
+            if chunk:
+                self._buffer += self._decoder.decompress(chunk)
+            else:
+                self._buffer += self._decoder.flush()
+                self._done = True
+        if size is None or size < 0 or len(self._buffer) <= size:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        if self._done and not self._buffer:
+            self.close()
+        return data
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._unregister is not None:
+            self._unregister()
+        if self._raw.isclosed() and not self._raw.will_close and not (self._token and self._token.cancelled):
+            self._client._release(self._key, conn)
+        else:
+            # body not fully read (or server wants to close), so the connection cannot be reused
+            self._raw.close()
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HTTPClient:
+    def __init__(self, timeout=15, pool_size=4, user_agent=USER_AGENT, resilience=None):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.user_agent = user_agent
+        self.resilience = get_resilience() if resilience is None else resilience
+
+        self._lock = threading.Lock()
+        self._pools = collections.defaultdict(collections.deque)
+
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.bytes_received = 0
+
+    def open(self, url, headers=None, timeout=None):
+        """GET url, retrying transient failures until the body starts arriving. Raises TransientError if they persist."""
+        timeout = self.timeout if timeout is None else timeout
+        return self.resilience.call(urllib.parse.urlsplit(url).hostname,
+                                    lambda remaining: self._open(url, headers, min(timeout, remaining)))
+
+    def _open(self, url, headers, timeout):
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request(url, headers, timeout)
+            if response.status in REDIRECT_CODES and response.headers.get('Location'):
+                location = urllib.parse.urljoin(url, response.headers['Location'])
+                response.read()
+                response.close()
+                url = location
+                continue
+            if response.status >= 400:
+                body = response.read()
+                response.close()
+                raise HTTPStatusError(url, response.status, body)
+            return response
+        raise HTTPStatusError(url, response.status)
+
+    def get(self, url, headers=None, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+
+        def attempt(remaining):
+            # the whole body is read inside the attempt, so a connection dropped halfway is retried as well
+            with self._open(url, headers, min(timeout, remaining)) as response:
+                return response.read()
+
+        return self.resilience.call(urllib.parse.urlsplit(url).hostname, attempt)
+
+    def _request(self, url, headers, timeout):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        request_headers = {'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        if headers:
+            request_headers.update(headers)
+
+        token = cancel.current()
+        if token is not None:
+            token.check()
+        with self._lock:
+            self.requests += 1
+        conn, reused = self._acquire(key, timeout)
+        try:
+            try:
+                raw, unregister = self._send(conn, path, request_headers, token)
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused or (token is not None and token.cancelled):
+                    raise
+                _LOG.debug('Pooled connection to %s went stale, reconnecting', parts.hostname)
+                conn = self._connect(key, timeout)
+                raw, unregister = self._send(conn, path, request_headers, token)
+        except BaseException as e:
+            conn.close()
+            if token is not None and token.cancelled:
+                raise cancel.Cancelled() from e
+            raise
+        return Response(self, key, conn, raw, url, token, unregister)
+
+    def _send(self, conn, path, headers, token):
+        if conn.sock is None:
+            conn.connect()
+        # the response can outlive conn.sock (http.client drops it when the server will close), so keep our own
+        unregister = None if token is None else token.on_cancel(lambda sock=conn.sock: _abort(sock))
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn.getresponse(), unregister
+        except BaseException:
+            if unregister is not None:
+                unregister()
+            raise
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            pool = self._pools[key]
+            if pool:
+                conn = pool.pop()
+                self.connections_reused += 1
+                conn.timeout = self.timeout if timeout is None else timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        with self._lock:
+            self.connections_opened += 1
+        return connection_class(host, port, timeout=self.timeout if timeout is None else timeout)
+
+    def _release(self, key, conn):
+        with self._lock:
+            pool = self._pools[key]
+            if len(pool) < self.pool_size:
+                pool.append(conn)
+                return
+        conn.close()
+
+    def _count_bytes(self, count):
+        with self._lock:
+            self.bytes_received += count
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, collections.defaultdict(collections.deque)
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'connections_reused': self.connections_reused,
+                'reuse_rate': self.connections_reused / self.requests if self.requests else 0.0,
+                'bytes_received': self.bytes_received,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
+
+
+def configure(timeout=None, pool_size=None):
+    client = get_client()
+    if timeout is not None:
+        client.timeout = timeout
+    if pool_size is not None:
+        client.pool_size = pool_size
+    return client
@@ -0,0 +1,102 @@
+import logging
+import os
+import sqlite3
+import threading
+
+try:
+    from .normalize import normalize, strip_stress, entry_keys
+except ImportError:
+    from normalize import normalize, strip_stress, entry_keys
+
+_LOG = logging.getLogger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS forms (
+    form TEXT NOT NULL,
+    lemma TEXT NOT NULL,
+    PRIMARY KEY (form, lemma)
+) WITHOUT ROWID;
+'''
+
+
+class InflectionIndex:
+    """Persistent map from normalized inflected forms to the lemma page they belong to.
+
+    Kept in sqlite and looked up there, so opening it costs the same however many lemmas it holds.
+    New forms are committed every COMMIT_EVERY lemmas and on flush().
+    """
+
+    COMMIT_EVERY = 100
+
+    def __init__(self, path, language=None):
+        self.path = path
+        self.language = language
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._import_text_index(os.path.splitext(path)[0] + '.txt')
+
+    def _import_text_index(self, text_path):
+        # the tab separated file earlier versions kept, read once into an empty index
+        if text_path == self.path or not os.path.exists(text_path):
+            return
+        if self._db.execute('SELECT 1 FROM forms LIMIT 1').fetchone() is not None:
+            return
+        with open(text_path, 'r', encoding='utf-8') as f:
+            rows = [(form, parts[0]) for parts in (line.rstrip('\n').split('\t') for line in f) for form in parts[1:]]
+        self._db.executemany('INSERT OR IGNORE INTO forms VALUES (?, ?)', rows)
+        self._db.commit()
+        _LOG.info('Imported %d forms from %s', len(rows), text_path)
+
+    def lookup(self, word):
+        """Titles of the lemma pages that have word in their inflection table."""
+        with self._lock:
+            lemmas = [lemma for lemma, in self._db.execute(
+                'SELECT lemma FROM forms WHERE form = ?', (normalize(word, self.language),))]
+            if lemmas:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return lemmas
+
+    def add_entry(self, entry):
+        if entry.inflections is None:
+            return
+        lemma = strip_stress(entry.word)
+        forms = sorted(entry_keys(entry, self.language))
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany('INSERT OR IGNORE INTO forms VALUES (?, ?)', [(form, lemma) for form in forms])
+            if self._db.total_changes == before:
+                return
+            self._uncommitted += 1
+            if self._uncommitted >= InflectionIndex.COMMIT_EVERY:
+                self._commit()
+
+    def _commit(self):
+        self._db.commit()
+        self._uncommitted = 0
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(DISTINCT form) FROM forms').fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            forms, lemmas = self._db.execute('SELECT COUNT(DISTINCT form), COUNT(DISTINCT lemma) FROM forms').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'forms': forms, 'lemmas': lemmas}
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    from .dumpparser import DumpEntry
+    from .flashcard import Flashcard
+except ImportError:
+    from dumpparser import DumpEntry
+    from flashcard import Flashcard
+
+_LOG = logging.getLogger(__name__)
+
+# failed lookups are not recorded on purpose, a resumed job tries them again
+CARD = 'card'
+NOT_FOUND = 'not_found'
+REVIEW = 'review'
+# looked up already, a word waiting for review only needs its choice made
+DONE = {CARD, NOT_FOUND, REVIEW}
+
+
+def entry_data(entry):
+    # same shape as a dumpparser record, so DumpEntry can bring it back
+    return {
+        'word': entry.word,
+        'pos': entry.part_of_speech,
+        'senses': [{'text': definition.text,
+                    'examples': [[example.text, example.translation] for example in definition.examples]}
+                   for definition in entry.definitions],
+        'forms': [],
+        'audio': list(entry.audio_links),
+        'form_of': [],
+    }
+
+
+def card_payload(card, with_audio=True):
+    chosen = None
+    if card.chosen_entry is not None:
+        chosen = next((i for i, entry in enumerate(card.entries) if entry is card.chosen_entry), None)
+    return {
+        'word': card.entered_word,
+        'language': card.language,
+        'entries': [entry_data(entry) for entry in card.entries],
+        'chosen': chosen,
+        'audio_file': card.audio_file if card.audio_ready and with_audio else None,
+        'audio_failed': card.audio_failed,
+    }
+
+
+class JournalParser:
+    """Hands back the entries a journal recorded for a word, so a resumed card is made without the network."""
+
+    def __init__(self, language, entries):
+        self.language = language
+        self._entries = entries
+
+    def fetch(self, word):
+        return [DumpEntry(self, data['word'], data) for data in self._entries]
+
+
+def restore_card(payload, language):
+    # journals written before mixed language batches have no language of their own
+    language = payload.get('language') or language
+    entries = JournalParser(language, payload['entries']).fetch(payload['word'])
+    card = Flashcard.restored(payload['word'], entries, language)
+    if payload['chosen'] is not None and card.chosen_entry is None:
+        card.select_entry(payload['chosen'])
+    audio_file = payload['audio_file']
+    # audio is fetched again if it failed or the file has gone since
+    if audio_file is not None and not payload['audio_failed'] and (not audio_file or os.path.exists(audio_file)):
+        card.set_audio_file(audio_file)
+    return card
+
+
+class JobJournal:
+    """Outcome of each word of a batch, appended as it happens, so an interrupted batch can be picked up again."""
+
+    def __init__(self, path, language=None):
+        self.path = path
+        self.language = language
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(language, words):
+        digest = hashlib.sha1(language.encode('utf-8'))
+        for word in words:
+            digest.update(b'\n' + word.encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def for_job(cls, directory, language, words):
+        return cls(os.path.join(directory, f'{language}-{cls.job_id(language, words)}.jsonl'), language)
+
+    def record(self, word, status, card=None, with_audio=True):
+        item = {'word': word, 'status': status, 'time': int(time.time())}
+        if card is not None:
+            item['card'] = card_payload(card, with_audio)
+        line = json.dumps(item, ensure_ascii=False) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def outcomes(self):
+        """Last recorded outcome per word."""
+        outcomes = {}
+        with self._lock:
+            if not os.path.exists(self.path):
+                return outcomes
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        # the last line is cut short if we were killed while writing it
+                        _LOG.warning('Skipping damaged line in %s', self.path)
+                        continue
+                    outcomes[item['word']] = item
+        return outcomes
+
+    def remaining(self, words):
+        outcomes = self.outcomes()
+        return [word for word in words if outcomes.get(word, {}).get('status') not in DONE]
+
+    def restore(self, item):
+        return restore_card(item['card'], self.language)
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
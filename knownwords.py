@@ -0,0 +1,98 @@
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+
+try:
+    from .normalize import normalize
+except ImportError:
+    from normalize import normalize
+
+_LOG = logging.getLogger(__name__)
+
+_TAG = re.compile(r'<[^>]+>')
+# backs are built by builddeck.to_html, which starts with the part of speech in bold
+_PART_OF_SPEECH = re.compile(r'^\s*<b>(.*?)</b>')
+
+_NOTES_IN_DECK = ('SELECT flds FROM notes WHERE mid = ? AND id IN (SELECT nid FROM cards WHERE did = ?)')
+
+
+class KnownWords:
+    """Words (and their part of speech) that already have a note in a deck."""
+
+    def __init__(self, language=None):
+        self.language = language
+        self._words = set()
+        self._entries = set()
+
+    def add(self, word, part_of_speech=''):
+        key = normalize(_TAG.sub('', word), self.language)
+        self._words.add(key)
+        self._entries.add((key, normalize(part_of_speech, self.language)))
+
+    def add_fields(self, fields):
+        front = fields[0]
+        back = fields[1] if len(fields) > 1 else ''
+        match = _PART_OF_SPEECH.match(back)
+        self.add(front, match.group(1) if match else '')
+
+    def __contains__(self, word):
+        return normalize(word, self.language) in self._words
+
+    def has(self, word, part_of_speech):
+        return (normalize(word, self.language), normalize(part_of_speech, self.language)) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_known(self, word, inflections=None):
+        if ':' in word:
+            parts = word.split(':')
+            return self.has(parts[0], parts[1])
+        if word in self:
+            return True
+        return inflections is not None and any(lemma in self for lemma in inflections.lookup(word))
+
+    def filter(self, words, inflections=None):
+        """Split words into (still to do, already in the deck). Uses the inflection index to catch known lemmas."""
+        remaining, known = [], []
+        for word in words:
+            (known if self.is_known(word, inflections) else remaining).append(word)
+        return remaining, known
+
+    @classmethod
+    def from_rows(cls, rows, language=None):
+        known = cls(language)
+        for flds, in rows:
+            known.add_fields(flds.split('\x1f'))
+        return known
+
+    @classmethod
+    def from_collection(cls, col, deck, language=None):
+        deck_id = _collection_deck_id(col, deck.name)
+        if deck_id is None:
+            return cls(language)
+        return cls.from_rows(col.db.all(_NOTES_IN_DECK, deck.model.model_id, deck_id), language)
+
+    @classmethod
+    def from_apkg(cls, path, deck, language=None):
+        with zipfile.ZipFile(path) as package:
+            fd, db_path = tempfile.mkstemp(suffix='.anki2')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(package.read('collection.anki2'))
+        try:
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute(_NOTES_IN_DECK, (deck.model.model_id, deck.guid)).fetchall()
+            conn.close()
+        finally:
+            os.remove(db_path)
+        return cls.from_rows(rows, language)
+
+
+def _collection_deck_id(col, name):
+    decks = col.decks
+    if hasattr(decks, 'id_for_name'):
+        return decks.id_for_name(name)
+    return decks.id(name, create=False)
@@ -0,0 +1,104 @@
+import collections
+import logging
+import threading
+
+_LOG = logging.getLogger(__name__)
+
+
+def entry_key(entry):
+    """The links an entry is followed by, None for an entry that is a base itself."""
+    links = getattr(entry, 'base_links', None)
+    if links:
+        return tuple(sorted(str(link) for link in links))
+    return None
+
+
+class LemmaGraph:
+    """Form -> lemma edges shared by every card of a batch, so each base page is followed once.
+
+    The edges hold the parser's entries, so only the max_edges most recently used are kept. A long batch
+    follows a page again once it has dropped out rather than holding every page it ever followed.
+    """
+
+    # a few KB each with their senses and forms, so a few MB at most
+    MAX_EDGES = 2048
+
+    def __init__(self, max_edges=MAX_EDGES):
+        self._lock = threading.Lock()
+        self._edges = collections.OrderedDict()
+        self.max_edges = max_edges
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.cycles = 0
+
+    def resolve(self, entries):
+        base_entries = []
+        for entry in entries:
+            base_entries.extend(self._resolve(entry, ()))
+        return base_entries
+
+    def _resolve(self, entry, path):
+        key = entry_key(entry)
+        if key is None:
+            return [entry]
+
+        # only the follow is memoized: forms sharing links still get their own entry when nothing is followed
+        path = path + (key,)
+        base_entries = []
+        for followed in self.follow(entry, key):
+            followed_key = entry_key(followed)
+            if followed is entry or (followed_key is not None and followed_key in path):
+                if followed is not entry:
+                    with self._lock:
+                        self.cycles += 1
+                    _LOG.debug('Cycle following %s to %s, stopping at %s', path[0], followed_key, entry.word)
+                base_entries.append(followed if followed_key == key else entry)
+            else:
+                base_entries.extend(self._resolve(followed, path))
+        return base_entries or [entry]
+
+    def follow(self, entry, key=None):
+        """One step of entry.follow_to_base(), fetched once even if several threads ask at the same time."""
+        key = entry_key(entry) if key is None else key
+        with self._lock:
+            if key in self._edges:
+                self.hits += 1
+                self._edges.move_to_end(key)
+                return self._edges[key]
+            event = self._inflight.get(key)
+            if event is None:
+                self.misses += 1
+                event = self._inflight[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                followed = self._edges.get(key)
+                if followed is not None:
+                    self.hits += 1
+                    return followed
+            # the thread that was fetching it failed, so try again ourselves
+            return self.follow(entry, key)
+
+        try:
+            followed = entry.follow_to_base() or []
+            with self._lock:
+                self._edges[key] = followed
+                if len(self._edges) > self.max_edges:
+                    self._edges.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+        return followed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'cycles': self.cycles, 'lemmas': len(self._edges),
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
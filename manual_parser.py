@@ -1,9 +1,15 @@
 import logging
 
+try:
+    from .normalize import normalize
+except ImportError:
+    from normalize import normalize
+
+_LOG = logging.getLogger(__name__)
+
 
 class ManualDefinition:
     def __init__(self, word, definition):
-        self._logger = logging.getLogger('ManualDef')
         self.base_word = word
         self.base_link = None
         self.text = definition
@@ -12,7 +18,6 @@ class ManualDefinition:
 
 class ManualEntry:
     def __init__(self, word, language, pos, definition):
-        self._logger = logging.getLogger('Manual-%s' % word)
         self.word = word
         self.language = language
         self.part_of_speech = pos
@@ -23,6 +28,7 @@ class ManualEntry:
         self.audio_links = []
         self.base_links = []
         self.base_links_set = set()
+        self.normalized_keys = frozenset([normalize(word, language)])
 
     def follow_to_base(self):
         return [self]
@@ -38,11 +44,10 @@ class ManualEntry:
 
 class ManualParser:
     def __init__(self, language):
-        self._logger = logging.getLogger('ManualParser')
         self.language = language
 
     def fetch(self, word):
-        parts = word.split(':')
+        parts = [part.strip() for part in word.split(':')]
         word = parts[0]
         pos = parts[1]
         meaning = parts[2]
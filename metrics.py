@@ -0,0 +1,110 @@
+import collections
+import contextlib
+import json
+import math
+import random
+import threading
+import time
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class Stage:
+    """Count, total and max of a stage's timings, and a fixed size random sample of them for the percentiles."""
+
+    __slots__ = ('count', 'total', 'max', 'sample')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sample = []
+
+    def add(self, seconds, sample_size, rng):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.sample) < sample_size:
+            self.sample.append(seconds)
+        else:
+            # reservoir sampling: every timing so far has the same chance of being in the sample
+            i = rng.randrange(self.count)
+            if i < sample_size:
+                self.sample[i] = seconds
+
+
+class Metrics:
+    """Timings per pipeline stage, shared by every thread of a run. Memory stays the same however long it runs."""
+
+    SAMPLE_SIZE = 2048
+
+    def __init__(self, sample_size=SAMPLE_SIZE):
+        self._lock = threading.Lock()
+        self._stages = collections.defaultdict(Stage)
+        self.sample_size = sample_size
+        self._rng = random.Random(0)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._stages[stage].add(seconds, self.sample_size, self._rng)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def stages(self):
+        with self._lock:
+            stages = {name: (stage.count, stage.total, stage.max, sorted(stage.sample))
+                      for name, stage in self._stages.items()}
+        return {
+            name: {
+                'count': count,
+                'total': round(total, 4),
+                'p50': round(percentile(sample, 50), 4),
+                'p95': round(percentile(sample, 95), 4),
+                'p99': round(percentile(sample, 99), 4),
+                'max': round(largest, 4),
+            }
+            for name, (count, total, largest, sample) in stages.items()
+        }
+
+    def report(self, **sources):
+        """stages, plus the stats() of whatever else is passed in (http=..., cache=...)."""
+        report = {'stages': self.stages()}
+        report.update(sources)
+        return report
+
+    def summary(self):
+        lines = [f"{'stage':<16}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for stage, stats in sorted(self.stages().items(), key=lambda item: -item[1]['total']):
+            lines.append(f"{stage:<16}{stats['count']:>7}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}")
+        return '\n'.join(lines)
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def timer(stage):
+    return _metrics.timer(stage)
@@ -0,0 +1,71 @@
+import functools
+import unicodedata
+
+ACUTE = '\u0301'
+GRAVE = '\u0300'
+
+# stress marks and soft hyphens are never part of a headword, whatever the language
+_STRESS = {ACUTE: None, GRAVE: None, '\u00ad': None}
+
+_TABLES = {
+    'russian': str.maketrans(dict(_STRESS, **{'ё': 'е'})),
+}
+_DEFAULT_TABLE = str.maketrans(_STRESS)
+
+_CODES = {
+    'ru': 'russian',
+    'es': 'spanish',
+    'it': 'italian',
+    'de': 'german',
+}
+
+
+def _table(language):
+    if not language:
+        return _DEFAULT_TABLE
+    language = language.lower()
+    return _TABLES.get(_CODES.get(language, language), _DEFAULT_TABLE)
+
+
+# sized for the words in flight rather than the whole batch, so a long batch does not keep growing it
+@functools.lru_cache(maxsize=1 << 12)
+def normalize(word, language=None):
+    """Key used to compare words: lower case, NFC, without stress marks and with language specific folding."""
+    return unicodedata.normalize('NFC', word.strip()).lower().translate(_table(language))
+
+
+def strip_stress(word):
+    """The word as a page title: original case, without stress marks."""
+    return unicodedata.normalize('NFC', word.strip()).translate(_DEFAULT_TABLE)
+
+
+def word_key(line, language=None):
+    # manual entries look like word:part of speech:definition, so each part is normalized on its own
+    return ':'.join(normalize(part, language) for part in line.split(':'))
+
+
+def unique_words(words, language=None):
+    seen = set()
+    unique = []
+    for word in words:
+        key = word_key(word, language)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(word)
+    return unique
+
+
+def entry_keys(entry, language=None):
+    """Normalized headword and inflections of an entry, computed once per entry."""
+    keys = getattr(entry, 'normalized_keys', None)
+    if keys is not None:
+        return keys
+    keys = {normalize(entry.word, language)}
+    if entry.inflections is not None:
+        keys.update(normalize(inflection, language) for inflection in entry.inflections.to_lower_set())
+    keys = frozenset(keys)
+    try:
+        entry.normalized_keys = keys
+    except AttributeError:
+        pass
+    return keys
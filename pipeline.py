@@ -0,0 +1,205 @@
+import logging
+import re
+import threading
+
+try:
+    from .flashcard import Flashcard
+    from .pyforvo import ForvoParser
+    from .manual_parser import ManualParser
+    from .wikicache import CachedParser
+    from .lemmas import LemmaGraph
+    from .resilience import ResilientParser, get_resilience
+    from .normalize import word_key
+except ImportError:
+    from flashcard import Flashcard
+    from pyforvo import ForvoParser
+    from manual_parser import ManualParser
+    from wikicache import CachedParser
+    from lemmas import LemmaGraph
+    from resilience import ResilientParser, get_resilience
+    from normalize import word_key
+
+_LOG = logging.getLogger(__name__)
+
+LANGUAGE_CODES = {
+    'Russian': 'ru',
+    'Spanish': 'es',
+    'Italian': 'it',
+    'German': 'de'
+}
+
+_TAG = re.compile(r'^\[([^\]]*)\]\s*(.*)$')
+
+
+def language_for_tag(tag):
+    """'Spanish', 'spanish' or 'es' -> 'Spanish', None if it names no supported language."""
+    tag = tag.strip().lower()
+    for language, code in LANGUAGE_CODES.items():
+        if tag in (language.lower(), code):
+            return language
+    return None
+
+
+def split_tag(word, default_language):
+    """'[es] casa' -> ('Spanish', 'casa'), a word without a tag is in default_language."""
+    match = _TAG.match(word)
+    if match is None:
+        return default_language, word
+    language = language_for_tag(match.group(1))
+    if language is None:
+        raise ValueError(f'Unknown language tag [{match.group(1)}]')
+    return language, match.group(2)
+
+
+def tag_word(language, word, default_language):
+    # words in the default language stay as they are, so a single language list keeps its journal and reports
+    if language == default_language:
+        return word
+    return f'[{LANGUAGE_CODES[language]}] {word}'
+
+
+def tagged_words(lines, default_language):
+    """Words of an input list, each tagged with its language unless it is default_language, duplicates dropped.
+
+    A line holding only a tag, like [Spanish], sets the language of the lines after it. A tag in front of a word,
+    like [es] casa, sets it for that word alone.
+    """
+    section = default_language
+    seen = set()
+    words = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        match = _TAG.match(line)
+        language, word = section, line
+        if match is not None:
+            language = language_for_tag(match.group(1))
+            if language is None:
+                raise ValueError(f'Unknown language tag [{match.group(1)}] on line {number}')
+            word = match.group(2)
+            if not word:
+                section = language
+                continue
+        key = (language, word_key(word, language))
+        if key[1] and key not in seen:
+            seen.add(key)
+            words.append(tag_word(language, word, default_language))
+    return words
+
+
+def _wiktionary_parser_class():
+    # imported on first use so a batch run against a local dictionary store does not need bs4/lxml
+    try:
+        from .russianwiktionaryparser import WiktionaryParser
+    except ImportError:
+        from russianwiktionaryparser import WiktionaryParser
+    return WiktionaryParser
+
+
+def warm_up():
+    """Import the wiktionary parser (bs4, lxml) ahead of the first lookup."""
+    try:
+        _wiktionary_parser_class()
+    except ImportError:
+        _LOG.debug('Wiktionary parser not available', exc_info=True)
+
+
+class CardMaker:
+    """Builds Flashcards for one language, sharing caches and lemma resolution across a batch."""
+
+    def __init__(self, language, language_code=None, cache=None, inflections=None, dictionary=None,
+                 forvo_scheduler=None):
+        self.language = language
+        self.language_code = LANGUAGE_CODES[language] if language_code is None else language_code
+        self.cache = cache
+        self.inflections = inflections
+        self.dictionary = dictionary
+        self.forvo_scheduler = forvo_scheduler
+        self.lemmas = LemmaGraph()
+        # one for the batch, every card keeps a reference to it. Made here, make() runs on several workers at once
+        self._forvo_parser = ForvoParser(language=self.language_code, audio_store=Flashcard.audio_store,
+                                         scheduler=forvo_scheduler)
+        # likewise one store for the batch, it keeps a connection per worker thread
+        self._dump_parser = None
+        if dictionary is not None:
+            try:
+                from .dumpparser import DumpParser
+            except ImportError:
+                from dumpparser import DumpParser
+            self._dump_parser = DumpParser(language, dictionary)
+
+    def make(self, word):
+        if ':' in word:
+            return Flashcard(word, ManualParser(language=self.language), self._forvo_parser, self.lemmas,
+                             self.inflections)
+        return Flashcard(word, self.word_parser(), self._forvo_parser, self.lemmas, self.inflections)
+
+    def word_parser(self):
+        if self._dump_parser is not None:
+            return self._dump_parser
+        # the parser does its own HTTP, so the retries and breaker go around its calls
+        parser = ResilientParser(_wiktionary_parser_class()(language=self.language), get_resilience(),
+                                 'en.wiktionary.org')
+        if self.cache is None:
+            return parser
+        return CachedParser(parser, self.cache, self.language)
+
+    def finish(self):
+        if self.inflections is not None:
+            self.inflections.flush()
+        if self.cache is not None:
+            self.cache.flush()
+
+
+class CardRouter:
+    """Sends each tagged word to the CardMaker of its language. Makers are made on first use by make_maker, which
+    hands them the shared cache, HTTP client and Forvo budget, so one pool of workers serves every language."""
+
+    def __init__(self, language, make_maker):
+        self.language = language
+        self._make_maker = make_maker
+        self._lock = threading.Lock()
+        self.makers = {}
+
+    def maker(self, language):
+        with self._lock:
+            maker = self.makers.get(language)
+            if maker is None:
+                maker = self.makers[language] = self._make_maker(language)
+            return maker
+
+    def make(self, word):
+        language, word = split_tag(word, self.language)
+        return self.maker(language).make(word)
+
+    def key(self, card):
+        """The tagged word a card was made from, as the journal and the known words filter know it."""
+        return tag_word(card.language or self.language, card.entered_word, self.language)
+
+    def filter_known(self, words, known_for):
+        """Split words into (new, known), known_for(language) giving the KnownWords of each language."""
+        known_words = {}
+        new, known = [], []
+        for word in words:
+            language, bare = split_tag(word, self.language)
+            if language not in known_words:
+                known_words[language] = known_for(language)
+            (known if known_words[language].is_known(bare, self.maker(language).inflections) else new).append(word)
+        return new, known
+
+    def languages(self):
+        with self._lock:
+            return list(self.makers)
+
+    def lemma_stats(self):
+        totals = {'hits': 0, 'misses': 0, 'cycles': 0, 'lemmas': 0}
+        for maker in list(self.makers.values()):
+            for name, value in maker.lemmas.stats().items():
+                if name in totals:
+                    totals[name] += value
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        return totals
+
+    def finish(self):
+        for maker in list(self.makers.values()):
+            maker.finish()
@@ -1,10 +1,24 @@
-import urllib.request
 import urllib.parse
 import json
 import shutil
 import logging
 import os
 
+try:
+    from .httpclient import get_client, HTTPStatusError
+    from .metrics import timer
+    from .resilience import TransientError
+    from .cancel import Cancelled
+except ImportError:
+    from httpclient import get_client, HTTPStatusError
+    from metrics import timer
+    from resilience import TransientError
+    from cancel import Cancelled
+
+
+class ForvoLimitReached(Exception):
+    pass
+
 
 def create_forvo_fname(word, code):
     return f"pronunciation_{code}_{word}.mp3"
@@ -21,11 +35,13 @@ class ForvoEntry:
         self.path = raw["pathmp3"]
         self.code = raw["code"]
 
-    def download(self, out_dir=''):
-        hdr = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; Win64; x64)'}
-        req = urllib.request.Request(self.path, headers=hdr)
+    def download(self, out_dir='', store=None, aliases=(), client=None):
         of = os.path.join(out_dir, create_forvo_fname(self.word, self.code))
-        with urllib.request.urlopen(req) as response, open(of, 'wb') as out_file:
+        if store is not None:
+            return store.fetch(self.path, of, aliases)
+
+        client = get_client() if client is None else client
+        with client.open(self.path) as response, open(of, 'wb') as out_file:
             shutil.copyfileobj(response, out_file)
 
         return of
@@ -100,41 +116,78 @@ class ForvoResults:
 
 
 class ForvoAgent:
-    def __init__(self, api_key: str):
+    BASE_URL = "https://apifree.forvo.com/action/word-pronunciations/format/json/word/"
+
+    def __init__(self, api_key: str, client=None):
         self.logger = logging.getLogger(__name__)
 
         self.api_key = api_key
+        self.client = get_client() if client is None else client
 
-        self.base_url = "https://apifree.forvo.com/action/word-pronunciations/format/json/word/"
+        self.base_url = ForvoAgent.BASE_URL
         self._data = {}
 
     def query(self, word: str, language: str, preferred_users=list) -> ForvoResults:
         if not self.api_key:
             return ForvoResults({'attributes': {'total': 0}})
         url = self.base_url + "{}/id_lang_speak/138/language/{}/key/{}/".format(urllib.parse.quote(word), language, self.api_key)
-        hdr = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; Win64; x64)'}
-        req = urllib.request.Request(url, headers=hdr)
 
         try:
-            response = urllib.request.urlopen(req)
+            response = self.client.get(url)
+        except HTTPStatusError as e:
+            # the free api answers 400 with ["Limit/day reached."] once the daily requests are used up
+            if b'limit' in e.body.lower():
+                raise ForvoLimitReached(e.body.decode('utf-8', 'replace')) from e
+            self.logger.error("Error downloading file", exc_info=True)
+            return ForvoResults({'attributes': {'total': 0}})
+        except (TransientError, Cancelled):
+            # not the same as forvo having no pronunciation, let the caller know
+            raise
         except Exception as e:
             self.logger.error("Error downloading file", exc_info=True)
             return ForvoResults({'attributes': {'total': 0}})
 
-        return ForvoResults(json.loads(response.read()), preferred_users)
+        return ForvoResults(json.loads(response), preferred_users)
 
 
 class ForvoParser:
-    def __init__(self, pref_users=None, language='ru'):
+    def __init__(self, pref_users=None, language='ru', audio_store=None, client=None, scheduler=None):
         self.logger = logging.getLogger('ForvoParser')
 
-        self.forvo = ForvoAgent(os.getenv('FORVO_API_KEY'))
+        self.forvo = ForvoAgent(os.getenv('FORVO_API_KEY'), client)
 
         self.pref_users = [] if pref_users is None else pref_users
         self.language = language
+        self.audio_store = audio_store
+        self.scheduler = scheduler
 
-    def download(self, word, out_dir):
-        prons = self.forvo.query(word, self.language, self.pref_users)
+    def store_key(self, word):
+        return f"forvo:{self.language}:{word}"
+
+    def download(self, word, out_dir, part_of_speech=''):
+        if self.audio_store is not None:
+            of = self.audio_store.fetch_cached(os.path.join(out_dir, create_forvo_fname(word, self.language)),
+                                               self.store_key(word))
+            if of is not None:
+                self.logger.debug('Using stored pronunciation for %s', word)
+                return of
+
+        if not self.forvo.api_key:
+            return None
+        if self.scheduler is not None and not self.scheduler.acquire():
+            self.scheduler.defer(word, self.language, part_of_speech)
+            return None
+
+        try:
+            with timer('forvo_query'):
+                prons = self.forvo.query(word, self.language, self.pref_users)
+        except ForvoLimitReached:
+            self.logger.warning('Forvo daily limit reached')
+            if self.scheduler is None:
+                return None
+            self.scheduler.limit_reached()
+            self.scheduler.defer(word, self.language, part_of_speech)
+            return None
 
         if not prons.num_pron:
             self.logger.debug('No results found for word %s', word)
@@ -148,7 +201,8 @@ class ForvoParser:
         if not os.path.exists(out_dir):
             os.mkdir(out_dir)
 
-        return selection.download(out_dir)
+        with timer('forvo_download'):
+            return selection.download(out_dir, self.audio_store, [self.store_key(word)], self.forvo.client)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,214 @@
+import http.client
+import logging
+import random
+import socket
+import threading
+import time
+
+try:
+    from .cancel import Cancelled, current
+except ImportError:
+    from cancel import Cancelled, current
+
+try:
+    # the wiktionary parser does its HTTP with requests
+    import requests
+    _REQUESTS_ERRORS = (requests.ConnectionError, requests.Timeout)
+except ImportError:
+    _REQUESTS_ERRORS = ()
+
+_LOG = logging.getLogger(__name__)
+
+# network failures, other OSErrors (missing files, a full disk) would fail again just the same
+_NETWORK_ERRORS = (ConnectionError, TimeoutError, socket.timeout, socket.gaierror,
+                   http.client.HTTPException) + _REQUESTS_ERRORS
+
+# statuses worth asking again for, anything else >= 400 is an answer
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TransientError(OSError):
+    """A lookup that failed for reasons that may go away, as opposed to the word not existing."""
+
+    def __init__(self, host, message):
+        super().__init__(message)
+        self.host = host
+
+
+class CircuitOpenError(TransientError):
+    pass
+
+
+def _status(exc):
+    status = getattr(exc, 'status', None)
+    if status is None:
+        # requests' HTTPError keeps it on the response
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status
+
+
+def is_transient(exc):
+    if isinstance(exc, TransientError):
+        return True
+    status = _status(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(exc, _NETWORK_ERRORS)
+
+
+class RetryPolicy:
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=8.0, deadline=30.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        # "full jitter": workers that failed together do not all come back at the same moment
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Per host: after failure_threshold transient failures in a row, fail fast for reset_after seconds."""
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened = {}
+        self._probing = set()
+
+    def allow(self, host):
+        with self._lock:
+            opened = self._opened.get(host)
+            if opened is None:
+                return True
+            if time.monotonic() - opened < self.reset_after or host in self._probing:
+                return False
+            # half open: let one request through to see if the host is back
+            self._probing.add(host)
+            return True
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened.pop(host, None)
+            self._probing.discard(host)
+
+    def record_failure(self, host):
+        with self._lock:
+            self._probing.discard(host)
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if failures >= self.failure_threshold:
+                if host not in self._opened:
+                    _LOG.warning('%s failed %d times in a row, pausing requests to it', host, failures)
+                self._opened[host] = time.monotonic()
+
+    def is_open(self, host):
+        with self._lock:
+            return host in self._opened
+
+
+class Resilience:
+    """Retries with backoff inside a deadline, behind a circuit breaker, for idempotent lookups."""
+
+    def __init__(self, policy=None, breaker=None, sleep=time.sleep):
+        self.policy = RetryPolicy() if policy is None else policy
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def call(self, host, fn, deadline=None):
+        """Run fn(remaining seconds) until it succeeds, fails for good or the deadline passes."""
+        deadline = time.monotonic() + (self.policy.deadline if deadline is None else deadline)
+        token = current()
+        for attempt in range(self.policy.attempts):
+            if token is not None:
+                token.check()
+            if not self.breaker.allow(host):
+                with self._lock:
+                    self.rejected += 1
+                raise CircuitOpenError(host, f'{host} is failing, not trying it for now')
+            try:
+                result = fn(max(0.1, deadline - time.monotonic()))
+            except Exception as e:
+                if isinstance(e, Cancelled):
+                    raise
+                if token is not None and token.cancelled:
+                    # the error is most likely the aborted connection, and says nothing about the host
+                    raise Cancelled() from e
+                if not is_transient(e):
+                    # the host answered, it just said no
+                    self.breaker.record_success(host)
+                    raise
+                self.breaker.record_failure(host)
+                delay = self.policy.backoff(attempt)
+                if attempt + 1 == self.policy.attempts or time.monotonic() + delay >= deadline:
+                    with self._lock:
+                        self.failures += 1
+                    raise TransientError(host, f'{host}: {e}') from e
+                _LOG.debug('Retrying %s in %.2fs after %s', host, delay, e)
+                with self._lock:
+                    self.retries += 1
+                if token is None:
+                    self._sleep(delay)
+                elif token.wait(delay):
+                    raise Cancelled()
+                continue
+            self.breaker.record_success(host)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {'retries': self.retries, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class ResilientParser:
+    """Wraps a dictionary parser that does its own HTTP so its lookups get the same retries and breaker."""
+
+    def __init__(self, parser, resilience, host):
+        self._parser = parser
+        self._resilience = resilience
+        self.host = host
+
+    def fetch(self, word):
+        return self._resilience.call(self.host, lambda remaining: self._parser.fetch(word))
+
+    def search(self, word):
+        return self._resilience.call(self.host, lambda remaining: self._parser.search(word))
+
+    def fetch_from_url(self, url):
+        return self._resilience.call(self.host, lambda remaining: self._parser.fetch_from_url(url))
+
+    def __getattr__(self, item):
+        return getattr(self._parser, item)
+
+
+_resilience = None
+_resilience_lock = threading.Lock()
+
+
+def get_resilience():
+    global _resilience
+    with _resilience_lock:
+        if _resilience is None:
+            _resilience = Resilience()
+        return _resilience
+
+
+def configure(attempts=None, deadline=None, failure_threshold=None, reset_after=None):
+    resilience = get_resilience()
+    if attempts is not None:
+        resilience.policy.attempts = max(1, attempts)
+    if deadline is not None:
+        resilience.policy.deadline = deadline
+    if failure_threshold is not None:
+        resilience.breaker.failure_threshold = failure_threshold
+    if reset_after is not None:
+        resilience.breaker.reset_after = reset_after
+    return resilience
@@ -0,0 +1,68 @@
+from PyQt5 import QtCore
+
+try:
+    from .builddeck import card_html
+except ImportError:
+    from builddeck import card_html
+
+
+def audio_state(card):
+    if not card.audio_ready:
+        return 'pending'
+    if card.audio_file:
+        return 'yes'
+    return 'failed' if card.audio_failed else 'no'
+
+
+class CardTableModel(QtCore.QAbstractTableModel):
+    """Cards for the results table. Cells are only worked out when the view asks for them."""
+
+    HEADERS = ['Word', 'Part of Speech', 'Definitions', 'Audio']
+    AUDIO_COLUMN = 3
+
+    def __init__(self, cards, parent=None):
+        super().__init__(parent)
+        self.cards = cards
+        self._rows = {id(card): row for row, card in enumerate(cards)}
+        self._definitions = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.cards)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(CardTableModel.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return CardTableModel.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        card = self.cards[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if column == 0:
+                return card.word
+            if column == 1:
+                return card.part_of_speech
+            if column == 2:
+                return self._definition_text(index.row(), card)
+            return audio_state(card)
+        if role == QtCore.Qt.ToolTipRole and column == 2:
+            return card_html(card)
+        return None
+
+    def _definition_text(self, row, card):
+        text = self._definitions.get(row)
+        if text is None:
+            text = self._definitions[row] = ' '.join(f'{i + 1}. {definition.text}'
+                                                     for i, definition in enumerate(card.definitions))
+        return text
+
+    def card_updated(self, card):
+        row = self._rows.get(id(card))
+        if row is not None:
+            index = self.index(row, CardTableModel.AUDIO_COLUMN)
+            self.dataChanged.emit(index, index)
@@ -0,0 +1,42 @@
+from audioprocess import AudioProcessor, AudioSettings, file_digest
+from audiostore import AudioStore
+
+
+def test_processed_audio_is_reused_by_source_hash(tmp_path):
+    store = AudioStore(str(tmp_path / 'store'))
+    processor = AudioProcessor(AudioSettings(format='ogg'), store)
+    original = tmp_path / 'media' / 'дом.mp3'
+    original.parent.mkdir()
+    original.write_bytes(b'original mp3')
+    processed = tmp_path / 'processed.ogg'
+    processed.write_bytes(b'processed')
+    store.add_file(str(processed), processor.store_key(file_digest(str(original))))
+
+    result = processor.process(str(original))
+
+    assert result == str(tmp_path / 'media' / 'дом.ogg')
+    assert open(result, 'rb').read() == b'processed'
+    assert processor.stats()['cached'] == 1
+
+
+def test_same_format_is_written_next_to_the_original(tmp_path):
+    store = AudioStore(str(tmp_path / 'store'))
+    processor = AudioProcessor(AudioSettings(format='mp3'), store)
+    original = tmp_path / 'дом.mp3'
+    original.write_bytes(b'original mp3')
+    processed = tmp_path / 'processed.mp3'
+    processed.write_bytes(b'processed')
+    store.add_file(str(processed), processor.store_key(file_digest(str(original))))
+
+    assert processor.process(str(original)) == str(tmp_path / 'дом_processed.mp3')
+    assert original.read_bytes() == b'original mp3'
+
+
+def test_unprocessable_audio_keeps_the_original(tmp_path):
+    original = tmp_path / 'дом.mp3'
+    original.write_bytes(b'not really audio')
+    processor = AudioProcessor(max_workers=1)
+
+    assert processor.process(str(original)) == str(original)
+    assert processor.stats()['failed'] == 1
+    processor.shutdown()
@@ -0,0 +1,33 @@
+import threading
+
+from audiostage import AudioStage
+
+
+class SlowCard:
+    def __init__(self, word, release):
+        self.word = word
+        self.release = release
+        self.audio_ready = False
+
+    def fetch_audio(self):
+        self.release.wait(5)
+        self.audio_ready = True
+
+
+def test_cards_get_audio_in_the_background():
+    release = threading.Event()
+    stage = AudioStage(num_workers=2)
+    done = []
+    cards = [SlowCard(word, release) for word in ('идти', 'дом', 'кот')]
+    for card in cards:
+        stage.submit(card, done.append)
+
+    assert stage.pending == 3
+    assert not stage.wait(timeout=0.05)
+
+    release.set()
+    assert stage.wait(timeout=5)
+    assert stage.pending == 0
+    assert sorted(card.word for card in done) == ['дом', 'идти', 'кот']
+    assert all(card.audio_ready for card in cards)
+    stage.shutdown()
@@ -0,0 +1,70 @@
+import io
+import os
+
+from audiostore import AudioStore
+
+
+class FakeOpener:
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+
+    def __call__(self, url):
+        self.requests.append(url)
+        return io.BytesIO(self.files[url])
+
+
+def test_known_url_is_not_downloaded_again(tmp_path):
+    opener = FakeOpener({'https://example.org/a.mp3': b'audio a'})
+    store = AudioStore(str(tmp_path / 'store'), opener=opener)
+
+    first = store.fetch('https://example.org/a.mp3', str(tmp_path / 'media' / 'a.mp3'))
+    os.remove(first)
+    second = store.fetch('//example.org/a.mp3', str(tmp_path / 'media' / 'a.mp3'))
+
+    assert opener.requests == ['https://example.org/a.mp3']
+    with open(second, 'rb') as f:
+        assert f.read() == b'audio a'
+    assert store.stats()['hits'] == 1
+
+
+def test_same_content_is_stored_once(tmp_path):
+    opener = FakeOpener({'https://example.org/a.mp3': b'same', 'https://example.org/b.mp3': b'same'})
+    store = AudioStore(str(tmp_path / 'store'), opener=opener)
+
+    store.fetch('https://example.org/a.mp3', str(tmp_path / 'a.mp3'))
+    store.fetch('https://example.org/b.mp3', str(tmp_path / 'b.mp3'))
+
+    assert store.size == len(b'same')
+
+
+def test_alias_lookup_without_url(tmp_path):
+    opener = FakeOpener({'https://example.org/a.mp3': b'audio a'})
+    store = AudioStore(str(tmp_path / 'store'), opener=opener)
+    store.fetch('https://example.org/a.mp3', str(tmp_path / 'a.mp3'), aliases=['forvo:ru:дом'])
+
+    assert store.fetch_cached(str(tmp_path / 'b.mp3'), 'forvo:ru:дом') == str(tmp_path / 'b.mp3')
+    assert store.fetch_cached(str(tmp_path / 'c.mp3'), 'forvo:ru:кот') is None
+
+
+def test_size_cap_evicts_oldest(tmp_path):
+    files = {f'https://example.org/{i}.mp3': bytes([i]) * 400 for i in range(5)}
+    store = AudioStore(str(tmp_path / 'store'), max_mb=1000 / 1024 / 1024, opener=FakeOpener(files))
+    for i in range(5):
+        store.fetch(f'https://example.org/{i}.mp3', str(tmp_path / f'{i}.mp3'))
+
+    assert store.size <= store.max_bytes
+    assert store.lookup('https://example.org/0.mp3') is None
+    assert store.lookup('https://example.org/4.mp3') is not None
+
+
+def test_other_clip_of_the_same_size_is_replaced(tmp_path):
+    opener = FakeOpener({'https://example.org/a.mp3': b'audio a'})
+    store = AudioStore(str(tmp_path / 'store'), opener=opener)
+    dest = tmp_path / 'media' / 'a.mp3'
+    dest.parent.mkdir()
+    dest.write_bytes(b'audio b')
+
+    store.fetch('https://example.org/a.mp3', str(dest))
+
+    assert dest.read_bytes() == b'audio a'
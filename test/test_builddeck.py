@@ -0,0 +1,172 @@
+import sqlite3
+import zipfile
+
+import pytest
+
+pytest.importorskip('genanki')
+
+from builddeck import DeckSet, GermanVocabDeck, ItalianVocabDeck, RussianVocabDeck, SpanishVocabDeck
+
+
+def read_notes(package, tmp_path):
+    with zipfile.ZipFile(package) as z:
+        db_path = tmp_path / 'collection.anki2'
+        db_path.write_bytes(z.read('collection.anki2'))
+        media = z.read('media')
+    with sqlite3.connect(str(db_path)) as conn:
+        return [row[0].split('\x1f') for row in conn.execute('SELECT flds FROM notes ORDER BY id')], media
+
+
+def test_streamed_notes_end_up_in_package(tmp_path):
+    audio = tmp_path / 'pronunciation_ru_дом.mp3'
+    audio.write_bytes(b'mp3')
+    deck = RussianVocabDeck()
+    out = str(tmp_path / 'out.apkg')
+    deck.stream_to(out)
+    deck.add_note('дом', 'house', str(audio))
+    deck.add_note('кот', 'cat')
+
+    assert deck.export() == [out]
+    assert len(deck.deck.notes) == 0
+    notes, media = read_notes(out, tmp_path)
+    assert [note[0] for note in notes] == ['дом', 'кот']
+    assert 'pronunciation_ru_дом.mp3' in media.decode('unicode_escape')
+
+
+def test_stream_is_split_into_shards(tmp_path):
+    deck = RussianVocabDeck()
+    deck.stream_to(str(tmp_path / 'out.apkg'), max_mb=200 / 1024 / 1024)
+    for i in range(10):
+        deck.add_note(f'word {i}', 'x' * 50)
+
+    files = deck.export()
+    assert len(files) > 1
+    assert files[0].endswith('out-001.apkg')
+    total = sum(len(read_notes(file, tmp_path)[0]) for file in files)
+    assert total == 10
+
+
+def test_guid_depends_only_on_word_and_part_of_speech():
+    deck = RussianVocabDeck()
+    assert deck.note_guid('до́м', 'Noun') == deck.note_guid('дом', 'noun')
+    assert deck.note_guid('дом', 'Noun') != deck.note_guid('дом', 'Verb')
+
+
+def test_same_word_in_two_languages_gets_two_guids():
+    assert SpanishVocabDeck().note_guid('casa', 'Noun') != ItalianVocabDeck().note_guid('casa', 'Noun')
+    assert SpanishVocabDeck().note_guid('Hotel', 'Noun') != GermanVocabDeck().note_guid('Hotel', 'Noun')
+
+
+def test_known_words_read_back_from_package(tmp_path):
+    from builddeck import to_html
+    from knownwords import KnownWords
+
+    class Definition:
+        text = 'house'
+        examples = []
+
+    deck = RussianVocabDeck()
+    out = str(tmp_path / 'out.apkg')
+    deck.stream_to(out)
+    deck.add_note('до́м', to_html([Definition()], 'Noun'), part_of_speech='Noun')
+    deck.export()
+
+    known = KnownWords.from_apkg(out, RussianVocabDeck(), 'Russian')
+    assert known.has('дом', 'noun')
+    assert known.filter(['дом', 'кот', 'дом:Noun:house', 'дом:Verb:x']) == (['кот', 'дом:Verb:x'],
+                                                                            ['дом', 'дом:Noun:house'])
+
+
+def test_deck_builder_writes_from_its_own_thread(tmp_path):
+    from builddeck import DeckBuilder
+
+    class Definition:
+        text = 'house'
+        examples = []
+
+    class Card:
+        word = 'дом'
+        part_of_speech = 'Noun'
+        definitions = [Definition()]
+        audio_file = ''
+        chosen_entry = object()
+
+    out = str(tmp_path / 'out.apkg')
+    builder = DeckBuilder(RussianVocabDeck())
+    builder.stream_to(out)
+    builder.add_flashcards([Card()])
+    assert builder.export().result() == [out]
+    notes, media = read_notes(out, tmp_path)
+    assert notes[0][:2] == ['дом', '<b>Noun</b><ol><li>house</li></ol>']
+
+
+def test_failed_export_can_be_tried_again(tmp_path):
+    from builddeck import DeckBuilder
+
+    class FlakyDeck(RussianVocabDeck):
+        failures = 1
+
+        def export(self, out_file='output.apkg'):
+            if self.failures:
+                self.failures -= 1
+                raise OSError('disk full')
+            return super().export(out_file)
+
+    out = str(tmp_path / 'out.apkg')
+    builder = DeckBuilder(FlakyDeck())
+    with pytest.raises(OSError):
+        builder.export(out).result()
+    assert builder.export(out).result() == [out]
+
+
+def test_shared_audio_is_packaged_once_and_not_recompressed(tmp_path):
+    first = tmp_path / 'pronunciation_ru_дом.mp3'
+    second = tmp_path / 'Ru-дом.mp3'
+    first.write_bytes(b'mp3' * 100)
+    second.write_bytes(b'mp3' * 100)
+    deck = RussianVocabDeck()
+    deck.add_note('дом', 'house', str(first))
+    deck.add_note('дома', 'at home', str(second))
+    out = str(tmp_path / 'out.apkg')
+
+    assert deck.export(out) == [out]
+    notes, media = read_notes(out, tmp_path)
+    assert [note[2] for note in notes] == ['[sound:pronunciation_ru_дом.mp3]'] * 2
+    with zipfile.ZipFile(out) as z:
+        infos = {info.filename: info for info in z.infolist()}
+    assert set(infos) == {'collection.anki2', 'media', '0'}
+    assert infos['0'].compress_type == zipfile.ZIP_STORED
+    assert infos['collection.anki2'].compress_type == zipfile.ZIP_DEFLATED
+
+
+class FakeCard:
+    def __init__(self, word, language):
+        self.word = word
+        self.language = language
+        self.chosen_entry = word
+        self.definitions = []
+        self.part_of_speech = 'noun'
+        self.audio_file = ''
+
+
+def test_deck_set_writes_a_package_per_language(tmp_path):
+    decks = DeckSet('Russian')
+    out = str(tmp_path / 'out.apkg')
+    decks.stream_to(out)
+    for card in (FakeCard('дом', 'Russian'), FakeCard('casa', 'Spanish'), FakeCard('кот', None)):
+        decks.add_flashcard(card)
+
+    spanish = str(tmp_path / 'out-Spanish.apkg')
+    assert decks.export(out) == [out, spanish]
+    assert [fields[0] for fields in read_notes(out, tmp_path)[0]] == ['дом', 'кот']
+    assert [fields[0] for fields in read_notes(spanish, tmp_path)[0]] == ['casa']
+
+
+def test_streamed_deck_set_exports_without_a_file_name(tmp_path):
+    decks = DeckSet('Russian')
+    out = str(tmp_path / 'out.apkg')
+    decks.stream_to(out)
+    decks.add_flashcard(FakeCard('дом', 'Russian'))
+    decks.add_flashcard(FakeCard('casa', 'Spanish'))
+
+    assert decks.export(None) == [out, str(tmp_path / 'out-Spanish.apkg')]
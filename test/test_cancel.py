@@ -0,0 +1,77 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from cancel import CancelToken, Cancelled, scope
+from httpclient import HTTPClient
+from resilience import CircuitBreaker, Resilience, RetryPolicy
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # promise a body and then hang, like a server that stopped answering halfway
+        self.send_response(200)
+        self.send_header('Content-Length', '1000')
+        self.end_headers()
+        self.wfile.write(b'x' * 10)
+        self.wfile.flush()
+        time.sleep(5)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StallingHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cancel_aborts_read_in_flight(server):
+    client = HTTPClient(timeout=30, resilience=Resilience(sleep=lambda seconds: None))
+    token = CancelToken()
+    errors = []
+
+    def fetch():
+        with scope(token):
+            try:
+                client.get(server + '/stall')
+            except Cancelled as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=fetch)
+    start = time.monotonic()
+    thread.start()
+    time.sleep(0.2)
+    token.cancel()
+    thread.join(2)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    assert time.monotonic() - start < 2
+    with scope(token), pytest.raises(Cancelled):
+        client.get(server + '/stall')
+
+
+def test_cancel_stops_retries():
+    token = CancelToken()
+    resilience = Resilience(RetryPolicy(attempts=5, base_delay=10, deadline=60), CircuitBreaker())
+    calls = []
+
+    def fail(remaining):
+        calls.append(remaining)
+        threading.Timer(0.05, token.cancel).start()
+        raise ConnectionResetError()
+
+    start = time.monotonic()
+    with scope(token), pytest.raises(Cancelled):
+        resilience.call('host', fail)
+    assert len(calls) == 1
+    assert time.monotonic() - start < 5
+    assert not resilience.breaker.is_open('host')
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from choices import ChoiceStore, Chooser
+
+
+class Card:
+    def __init__(self, entered_word, *entries):
+        self.entered_word = entered_word
+        self.entries = [SimpleNamespace(word=word, definitions=['d'] * count) for word, count in entries]
+        self.chosen = None
+
+    def select_entry(self, choice):
+        self.chosen = choice
+
+
+def test_choices_are_remembered_per_language(tmp_path):
+    path = str(tmp_path / 'choices.json')
+    chooser = Chooser('Russian', ChoiceStore(path))
+    card = Card('Замок', ('за́мок', 1), ('замо́к', 1))
+    assert not chooser.choose(card)
+
+    chooser.chosen([card], [1])
+    assert card.chosen == 1
+
+    again = Card('замок', ('за́мок', 1), ('замо́к', 1))
+    assert Chooser('Russian', ChoiceStore(path)).choose(again)
+    assert again.chosen == 1
+    assert not Chooser('Spanish', ChoiceStore(path)).choose(Card('замок', ('за́мок', 1), ('замо́к', 1)))
+
+
+def test_forgotten_entry_is_asked_again(tmp_path):
+    store = ChoiceStore(str(tmp_path / 'choices.json'))
+    chooser = Chooser('Russian', store)
+    chooser.chosen([Card('a', ('a1', 1), ('a2', 1))], [1], remember=False)
+    assert len(store) == 0
+
+    chooser.chosen([Card('a', ('a1', 1), ('a2', 1))], [1])
+    assert not chooser.choose(Card('a', ('a1', 1), ('a3', 1)))
+
+
+def test_tie_breakers():
+    card = Card('a', ('a1', 1), ('a2', 3), ('a3', 2))
+    assert Chooser('Russian', tie_breaker='most_definitions').choose(card)
+    assert card.chosen == 1
+    assert Chooser('Russian', tie_breaker='first').choose(card)
+    assert card.chosen == 0
@@ -0,0 +1,111 @@
+import json
+import sqlite3
+import zipfile
+
+import pytest
+
+pytest.importorskip('genanki')
+
+from cli import build_package
+from dumpparser import DumpParser, build_store
+from flashcard import Flashcard
+from journal import JobJournal, JournalParser
+from pipeline import tagged_words
+import journal
+
+DUMP = [
+    {'word': 'дом', 'lang': 'Russian', 'pos': 'noun', 'senses': [{'glosses': ['house']}]},
+    {'word': 'кот', 'lang': 'Russian', 'pos': 'noun', 'senses': [{'glosses': ['cat']}]},
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # no forvo and nothing left behind on Flashcard for other tests
+    monkeypatch.delenv('FORVO_API_KEY', raising=False)
+    for name in ('media_dir', 'audio_store', 'audio_processor'):
+        monkeypatch.setattr(Flashcard, name, getattr(Flashcard, name))
+    dump = tmp_path / 'dump.jsonl'
+    dump.write_text('\n'.join(json.dumps(entry, ensure_ascii=False) for entry in DUMP), encoding='utf-8')
+    path = str(tmp_path / 'russian.sqlite')
+    build_store(str(dump), 'Russian', path)
+    return path
+
+
+def fronts(package, tmp_path):
+    with zipfile.ZipFile(package) as z:
+        db_path = tmp_path / 'collection.anki2'
+        db_path.write_bytes(z.read('collection.anki2'))
+    with sqlite3.connect(str(db_path)) as conn:
+        return [row[0].split('\x1f')[0] for row in conn.execute('SELECT flds FROM notes ORDER BY id')]
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_build_package(tmp_path, store, stream):
+    out = str(tmp_path / 'vocab.apkg')
+    report = build_package(['дом', 'кот', 'собака'], 'Russian', out, 2, str(tmp_path / 'data'), dictionary=store,
+                           offline=True, stream=stream)
+
+    assert report['output'] == [out]
+    assert fronts(out, tmp_path) == ['дом', 'кот']
+    assert report['cards'] == 2
+    assert report['not_found'] == ['собака']
+    assert report['failed'] == [] and not report['cancelled']
+    for key in ('http', 'network', 'cache', 'audio', 'forvo', 'lemmas', 'choices', 'stages'):
+        assert key in report
+
+
+def test_resumes_an_interrupted_run(tmp_path, store):
+    data_dir = tmp_path / 'data'
+    words = ['дом', 'кот', 'собака']
+    job = JobJournal.for_job(str(data_dir / 'jobs'), 'Russian', words)
+    job.record('дом', journal.CARD, Flashcard('дом', DumpParser('Russian', store)))
+    job.record('собака', journal.NOT_FOUND)
+
+    out = str(tmp_path / 'vocab.apkg')
+    report = build_package(words, 'Russian', out, 2, str(data_dir), dictionary=store, offline=True)
+
+    assert report['resumed'] == 1
+    assert report['not_found'] == ['собака']
+    assert sorted(fronts(out, tmp_path)) == ['дом', 'кот']
+    # done with, so the next run of the list starts over
+    assert job.outcomes() == {}
+
+
+def test_unchosen_words_wait_for_review(tmp_path, store, monkeypatch):
+    # the store has one entry per word, a wiktionary page has one per homograph
+    homographs = JournalParser('Russian', [
+        {'word': headword, 'pos': 'noun', 'forms': [], 'audio': [], 'form_of': [],
+         'senses': [{'text': meaning, 'examples': []}]}
+        for headword, meaning in (('за́мок', 'castle'), ('замо́к', 'lock'))])
+    fetch = DumpParser.fetch
+    monkeypatch.setattr(DumpParser, 'fetch',
+                        lambda self, word: homographs.fetch(word) if word == 'замок' else fetch(self, word))
+    data_dir = str(tmp_path / 'data')
+    words = ['дом', 'замок']
+    out = str(tmp_path / 'vocab.apkg')
+    report = build_package(words, 'Russian', out, 2, data_dir, dictionary=store, offline=True, tie_breaker=None)
+
+    assert fronts(out, tmp_path) == ['дом']
+    assert report['review'] == ['замок']
+    assert report['ambiguous'] == [{'word': 'замок', 'entries': ['за́мок', 'замо́к'], 'chosen': None}]
+    job = JobJournal.for_job(str(tmp_path / 'data' / 'jobs'), 'Russian', words)
+    assert job.outcomes()['замок']['status'] == journal.REVIEW
+
+    report = build_package(words, 'Russian', out, 2, data_dir, dictionary=store, offline=True, tie_breaker='first')
+    assert report['resumed'] == 2 and report['review'] == []
+    assert sorted(fronts(out, tmp_path)) == ['дом', 'за́мок']
+    assert job.outcomes() == {}
+
+
+def test_mixed_languages_go_to_their_own_packages(tmp_path, store):
+    out = str(tmp_path / 'vocab.apkg')
+    words = ['дом', '[Spanish]', 'casa: noun: house', '[ru] кот']
+    report = build_package(words, 'Russian', out, 2, str(tmp_path / 'data'), dictionary=store, offline=True)
+
+    spanish = str(tmp_path / 'vocab-Spanish.apkg')
+    assert report['output'] == [out, spanish]
+    assert report['languages'] == {'Russian': 2, 'Spanish': 1}
+    assert report['words'] == len(tagged_words(words, 'Russian')) == 3
+    assert fronts(out, tmp_path) == ['дом', 'кот']
+    assert fronts(spanish, tmp_path) == ['casa']
@@ -0,0 +1,59 @@
+import json
+
+from dumpparser import DumpParser, build_store
+from flashcard import Flashcard
+from normalize import entry_keys
+
+DUMP = [
+    {'word': 'дом', 'lang': 'Russian', 'pos': 'noun',
+     'senses': [{'glosses': ['house'], 'examples': [{'text': 'мой дом', 'english': 'my house'}]}],
+     'forms': [{'form': 'до́ма', 'tags': ['genitive']}, {'form': 'домо́в', 'tags': ['genitive', 'plural']}],
+     'sounds': [{'ipa': '[dom]', 'mp3_url': 'https://example.org/dom.mp3'}]},
+    {'word': 'домов', 'lang': 'Russian', 'pos': 'noun',
+     'senses': [{'glosses': ['genitive plural of дом'], 'form_of': [{'word': 'дом'}]}]},
+    {'word': 'casa', 'lang': 'Spanish', 'pos': 'noun', 'senses': [{'glosses': ['house']}]},
+]
+
+
+def make_store(tmp_path):
+    dump = tmp_path / 'dump.jsonl'
+    dump.write_text('\n'.join(json.dumps(entry, ensure_ascii=False) for entry in DUMP), encoding='utf-8')
+    store = str(tmp_path / 'russian.sqlite')
+    assert build_store(str(dump), 'Russian', store) == 2
+    return DumpParser('Russian', store)
+
+
+def test_fetch_headword(tmp_path):
+    parser = make_store(tmp_path)
+
+    entry, = parser.fetch('дом')
+    assert entry.part_of_speech == 'Noun'
+    assert entry.definitions[0].text == 'house'
+    assert entry.definitions[0].examples[0].translation == 'my house'
+    assert entry.audio_links == ['https://example.org/dom.mp3']
+    assert 'домов' in entry_keys(entry, 'Russian')
+    assert parser.fetch('casa') == []
+
+
+def test_search_finds_inflected_forms(tmp_path):
+    parser = make_store(tmp_path)
+
+    result = parser.search('дома')
+    assert result[1] == ['дом']
+    assert parser.fetch_from_url(result[3][0])[0].word == 'дом'
+
+
+class FakeStore:
+    def fetch(self, url, dest, aliases=()):
+        return dest
+
+
+def test_flashcard_follows_form_to_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(Flashcard, 'audio_store', FakeStore())
+    card = Flashcard('домов', make_store(tmp_path))
+
+    assert card.word == 'дом'
+    assert not card.audio_ready
+    card.fetch_audio()
+    assert card.audio_file.endswith('dom.mp3')
+    assert card.definitions[0].text == 'house'
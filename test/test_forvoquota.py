@@ -0,0 +1,158 @@
+import pytest
+
+from forvoquota import ForvoBudget, DeferredQueue, ForvoScheduler, apply_to_collection
+from httpclient import HTTPStatusError
+from pyforvo import ForvoParser
+
+
+class LimitClient:
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, url):
+        self.requests += 1
+        raise HTTPStatusError(url, 400, b'["Limit/day reached."]')
+
+
+def test_budget_persists(tmp_path):
+    path = str(tmp_path / 'budget.json')
+    budget = ForvoBudget(path, daily_limit=2)
+    assert budget.acquire()
+    assert ForvoBudget(path, daily_limit=2).remaining == 1
+    assert budget.acquire()
+    assert not budget.acquire()
+
+
+def test_queue_dedupes_and_removes(tmp_path):
+    queue = DeferredQueue(str(tmp_path / 'deferred.jsonl'))
+    queue.add('идти', 'ru', 'Verb')
+    queue.add('идти', 'ru', 'Verb')
+    queue.add('дом', 'ru', 'Noun')
+    assert [item['word'] for item in queue.items()] == ['идти', 'дом']
+    queue.remove(queue.items()[:1])
+    assert [item['word'] for item in queue.items()] == ['дом']
+
+
+def test_over_budget_words_are_deferred(tmp_path, monkeypatch):
+    monkeypatch.setenv('FORVO_API_KEY', 'key')
+    scheduler = ForvoScheduler(ForvoBudget(str(tmp_path / 'budget.json'), daily_limit=10),
+                               DeferredQueue(str(tmp_path / 'deferred.jsonl')))
+    client = LimitClient()
+    parser = ForvoParser(language='ru', client=client, scheduler=scheduler)
+
+    assert parser.download('идти', str(tmp_path), 'Verb') is None
+    assert parser.download('дом', str(tmp_path), 'Noun') is None
+
+    # forvo's limit answer stops further requests for the day
+    assert client.requests == 1
+    assert scheduler.budget.remaining == 0
+    assert [(item['word'], item['part_of_speech']) for item in scheduler.queue.items()] == \
+        [('идти', 'Verb'), ('дом', 'Noun')]
+
+
+def make_scheduler(tmp_path, daily_limit=10):
+    return ForvoScheduler(ForvoBudget(str(tmp_path / 'budget.json'), daily_limit),
+                          DeferredQueue(str(tmp_path / 'deferred.jsonl')))
+
+
+class BackfillParser:
+    """Audio for дом, nothing on forvo for кот, and идти over the limit again."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def download(self, word, out_dir, part_of_speech=''):
+        self.scheduler.acquire()
+        if word == 'идти':
+            self.scheduler.defer(word, 'ru', part_of_speech)
+            return None
+        return f'{out_dir}/{word}.mp3' if word == 'дом' else None
+
+
+def test_download_deferred_keeps_words_still_over_the_limit(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    for word in ('дом', 'кот', 'идти'):
+        scheduler.queue.add(word, 'ru', 'Noun')
+
+    found = scheduler.download_deferred(lambda code: BackfillParser(scheduler), 'media')
+
+    assert [(item['word'], audio_file) for item, audio_file in found] == [('дом', 'media/дом.mp3')]
+    # дом leaves the queue once its note has the audio, кот is dropped as forvo has nothing
+    assert [item['word'] for item in scheduler.queue.items()] == ['дом', 'идти']
+
+
+def test_download_deferred_goes_on_after_a_failed_download(tmp_path):
+    from resilience import TransientError
+
+    scheduler = make_scheduler(tmp_path)
+    for word in ('дом', 'кот', 'сад'):
+        scheduler.queue.add(word, 'ru', 'Noun')
+
+    class FlakyParser(BackfillParser):
+        def download(self, word, out_dir, part_of_speech=''):
+            if word == 'кот':
+                raise TransientError('apifree.forvo.com', 'timed out')
+            return f'{out_dir}/{word}.mp3'
+
+    found = scheduler.download_deferred(lambda code: FlakyParser(scheduler), 'media')
+
+    assert [item['word'] for item, audio_file in found] == ['дом', 'сад']
+    assert [item['word'] for item in scheduler.queue.items()] == ['дом', 'кот', 'сад']
+
+
+def test_download_deferred_stops_when_the_budget_is_spent(tmp_path):
+    scheduler = make_scheduler(tmp_path, daily_limit=1)
+    scheduler.queue.add('дом', 'ru', 'Noun')
+    scheduler.queue.add('кот', 'ru', 'Noun')
+
+    assert len(scheduler.download_deferred(lambda code: BackfillParser(scheduler), 'media')) == 1
+    assert [item['word'] for item in scheduler.queue.items()] == ['дом', 'кот']
+
+
+class FakeDb:
+    def __init__(self, notes):
+        self.notes = notes
+
+    def scalar(self, sql, guid):
+        return guid if guid in self.notes else None
+
+
+class FakeMedia:
+    def add_file(self, path):
+        return path.rsplit('/', 1)[-1]
+
+
+class FakeCollection:
+    def __init__(self, notes):
+        self.notes = notes
+        self.db = FakeDb(notes)
+        self.media = FakeMedia()
+        self.updated = []
+
+    def get_note(self, note_id):
+        return self.notes[note_id]
+
+    def update_note(self, note):
+        self.updated.append(note)
+
+
+def test_apply_to_collection_fills_empty_audio_of_existing_notes(tmp_path):
+    pytest.importorskip('genanki')
+    from builddeck import RussianVocabDeck
+
+    deck = RussianVocabDeck()
+    queue = DeferredQueue(str(tmp_path / 'deferred.jsonl'))
+    for word in ('дом', 'кот', 'идти'):
+        queue.add(word, 'ru', 'Noun')
+    notes = {deck.note_guid('дом', 'Noun'): {'Audio': ''},
+             deck.note_guid('кот', 'Noun'): {'Audio': '[sound:mine.mp3]'}}
+    col = FakeCollection(notes)
+    found = [(item, f'media/{item["word"]}.mp3') for item in queue.items()]
+
+    assert apply_to_collection(col, found, lambda code: deck, queue) == 2
+    assert notes[deck.note_guid('дом', 'Noun')]['Audio'] == '[sound:дом.mp3]'
+    # audio the user already has is left alone
+    assert notes[deck.note_guid('кот', 'Noun')]['Audio'] == '[sound:mine.mp3]'
+    assert col.updated == [notes[deck.note_guid('дом', 'Noun')]]
+    # no note for идти yet, so it waits in the queue
+    assert [item['word'] for item in queue.items()] == ['идти']
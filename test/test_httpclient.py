@@ -0,0 +1,75 @@
+import gzip
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from httpclient import HTTPClient, HTTPStatusError
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path == '/plain':
+            self._send(200, b'hello')
+        elif self.path == '/gzip':
+            self._send(200, gzip.compress(b'compressed hello'), {'Content-Encoding': 'gzip'})
+        elif self.path == '/moved':
+            self._send(302, b'', {'Location': '/plain'})
+        else:
+            self._send(404, b'missing')
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.connections = set()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connection_is_reused(server):
+    client = HTTPClient(timeout=5)
+    for _ in range(5):
+        assert client.get(server + '/plain') == b'hello'
+
+    assert client.stats()['connections_opened'] == 1
+    assert client.stats()['connections_reused'] == 4
+    assert len(Handler.connections) == 1
+
+
+def test_gzip_is_decoded(server):
+    client = HTTPClient(timeout=5)
+    with client.open(server + '/gzip') as response:
+        assert response.read(4) == b'comp'
+        assert response.read() == b'ressed hello'
+
+
+def test_redirect_is_followed(server):
+    assert HTTPClient(timeout=5).get(server + '/moved') == b'hello'
+
+
+def test_error_status_raises(server):
+    client = HTTPClient(timeout=5)
+    with pytest.raises(HTTPStatusError) as error:
+        client.get(server + '/nothing')
+    assert error.value.status == 404
+    assert client.get(server + '/plain') == b'hello'
+    assert client.stats()['connections_opened'] == 1
@@ -0,0 +1,71 @@
+from inflindex import InflectionIndex
+from flashcard import Flashcard
+
+
+class FakeInflections:
+    def __init__(self, forms):
+        self.forms = forms
+
+    def to_lower_set(self):
+        return set(form.lower() for form in self.forms)
+
+
+class FakeEntry:
+    def __init__(self, word, forms=None):
+        self.word = word
+        self.part_of_speech = 'noun'
+        self.definitions = []
+        self.inflections = None if forms is None else FakeInflections(forms)
+        self.audio_links = []
+        self.base_links = []
+        self.tracing = []
+
+    def follow_to_base(self):
+        return []
+
+
+class FakeParser:
+    language = 'Russian'
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def fetch(self, word):
+        self.calls.append(('fetch', word))
+        return self.pages.get(word, [])
+
+    def search(self, word):
+        self.calls.append(('search', word))
+        return [word, [], [], []]
+
+
+def test_index_survives_reload(tmp_path):
+    path = str(tmp_path / 'inflections.sqlite')
+    index = InflectionIndex(path, 'Russian')
+    index.add_entry(FakeEntry('до́м', ['до́ма', 'домо́в']))
+    index.close()
+
+    reloaded = InflectionIndex(path, 'Russian')
+    assert reloaded.lookup('домов') == ['дом']
+    assert reloaded.lookup('кот') == []
+    assert reloaded.stats()['lemmas'] == 1
+
+
+def test_text_index_of_earlier_versions_is_imported(tmp_path):
+    (tmp_path / 'inflections.txt').write_text('дом\tдом\tдома\tдомах\n', encoding='utf-8')
+
+    index = InflectionIndex(str(tmp_path / 'inflections.sqlite'), 'Russian')
+    assert index.lookup('домах') == ['дом']
+    assert len(index) == 3
+
+
+def test_flashcard_uses_index_instead_of_search(tmp_path):
+    index = InflectionIndex(str(tmp_path / 'inflections.sqlite'), 'Russian')
+    index.add_entry(FakeEntry('дом', ['домов']))
+    parser = FakeParser({'дом': [FakeEntry('дом', ['домов'])]})
+
+    card = Flashcard('домов', parser, inflections=index)
+
+    assert card.word == 'дом'
+    assert ('search', 'домов') not in parser.calls
@@ -0,0 +1,55 @@
+from flashcard import Flashcard
+from metrics import get_metrics
+from journal import JobJournal, JournalParser, CARD, NOT_FOUND, REVIEW
+
+
+def make_card(word, *headwords):
+    entries = [{'word': headword, 'pos': 'noun', 'forms': [], 'audio': [], 'form_of': [],
+                'senses': [{'text': f'{headword} meaning', 'examples': [['text', 'translation']]}]}
+               for headword in headwords]
+    return Flashcard(word, JournalParser('Russian', entries))
+
+
+def test_resume_picks_up_recorded_outcomes(tmp_path):
+    words = ['дом', 'кот', 'замок', 'нет']
+    job = JobJournal.for_job(str(tmp_path), 'Russian', words)
+    audio = tmp_path / 'дом.mp3'
+    audio.write_bytes(b'mp3')
+
+    card = make_card('дом', 'дом')
+    card.set_audio_file(str(audio))
+    job.record('дом', CARD, card)
+    job.record('нет', NOT_FOUND)
+    job.record('замок', REVIEW, make_card('замок', 'за́мок', 'замо́к'))
+    with open(job.path, 'a', encoding='utf-8') as f:
+        f.write('{"word": "кот", "sta')
+
+    again = JobJournal.for_job(str(tmp_path), 'Russian', words)
+    assert again.path == job.path
+    # the word waiting for review was looked up already, only a failed write is left to do
+    assert again.remaining(words) == ['кот']
+
+    outcomes = again.outcomes()
+    get_metrics().reset()
+    restored = again.restore(outcomes['дом'])
+    assert restored.word == 'дом'
+    assert restored.audio_ready and restored.audio_file == str(audio)
+    assert [d.text for d in restored.definitions] == ['дом meaning']
+    assert restored.definitions[0].examples[0].translation == 'translation'
+
+    review = again.restore(outcomes['замок'])
+    assert review.chosen_entry is None
+    assert [entry.word for entry in review.entries] == ['за́мок', 'замо́к']
+    # nothing was looked up again, so nothing is timed as a lookup
+    assert 'fetch' not in get_metrics().stages()
+
+
+def test_missing_audio_is_fetched_again(tmp_path):
+    job = JobJournal(str(tmp_path / 'job.jsonl'), 'Russian')
+    card = make_card('дом', 'дом')
+    card.set_audio_file(str(tmp_path / 'gone.mp3'))
+    job.record('дом', CARD, card)
+
+    assert not job.restore(job.outcomes()['дом']).audio_ready
+    job.clear()
+    assert job.outcomes() == {}
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from lemmas import LemmaGraph
+
+
+class FakeEntry:
+    follows = 0
+
+    def __init__(self, word, bases=()):
+        self.word = word
+        self.part_of_speech = 'verb'
+        self.base_links = [f'/wiki/{base.word}' for base in bases]
+        self.bases = list(bases)
+
+    def follow_to_base(self):
+        FakeEntry.follows += 1
+        time.sleep(0.02)
+        return self.bases
+
+
+def test_shared_base_is_followed_once():
+    FakeEntry.follows = 0
+    base = FakeEntry('идти')
+    graph = LemmaGraph()
+    threads = [threading.Thread(target=graph.resolve, args=([FakeEntry('иду', [base])],)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert graph.resolve([FakeEntry('иду', [base])]) == [base]
+    # the form page once, the base has no links of its own to follow
+    assert FakeEntry.follows == 1
+
+
+def test_cycles_stop_explicitly():
+    first = FakeEntry('a')
+    second = FakeEntry('b', [first])
+    first.bases = [second]
+    first.base_links = ['/wiki/b']
+
+    graph = LemmaGraph()
+    assert graph.resolve([first]) == [second]
+    assert graph.stats()['cycles'] == 1
+
+
+def test_entry_pointing_at_itself_is_its_own_base():
+    class SelfEntry(FakeEntry):
+        def follow_to_base(self):
+            return [self]
+
+    entry = SelfEntry('дом')
+    assert LemmaGraph().resolve([entry]) == [entry]
+
+
+def test_same_word_from_another_parser_keeps_its_own_entry():
+    from manual_parser import ManualEntry
+
+    wiktionary = FakeEntry('дом')
+    manual = ManualEntry('дом', 'Russian', 'noun', 'my own definition')
+    graph = LemmaGraph()
+
+    assert graph.resolve([wiktionary]) == [wiktionary]
+    assert graph.resolve([manual]) == [manual]
+
+
+def test_forms_sharing_links_keep_their_own_entry_when_nothing_is_followed():
+    # e.g. the base page could not be fetched
+    feminine = FakeEntry('красивая')
+    neuter = FakeEntry('красивое')
+    feminine.base_links = neuter.base_links = ['/wiki/красивый']
+    graph = LemmaGraph()
+
+    assert graph.resolve([feminine]) == [feminine]
+    assert graph.resolve([neuter]) == [neuter]
+
+
+def test_only_recent_edges_are_kept():
+    graph = LemmaGraph(max_edges=2)
+    for form, base in (('иду', 'идти'), ('несу', 'нести'), ('веду', 'вести')):
+        graph.resolve([FakeEntry(form, [FakeEntry(base)])])
+
+    assert graph.stats()['lemmas'] == 2
@@ -0,0 +1,37 @@
+from metrics import Metrics, percentile
+
+
+def test_percentiles_use_nearest_rank():
+    values = sorted(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+def test_stages_are_summarised():
+    metrics = Metrics()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        metrics.record('fetch', seconds)
+    with metrics.timer('export'):
+        pass
+
+    report = metrics.report(http={'requests': 3})
+    assert report['stages']['fetch']['count'] == 4
+    assert report['stages']['fetch']['p50'] == 0.2
+    assert report['stages']['fetch']['max'] == 0.4
+    assert report['stages']['export']['count'] == 1
+    assert report['http'] == {'requests': 3}
+    assert 'fetch' in metrics.summary()
+
+
+def test_percentiles_come_from_a_bounded_sample():
+    metrics = Metrics(sample_size=100)
+    for i in range(10000):
+        metrics.record('fetch', i / 10000)
+
+    stats = metrics.stages()['fetch']
+    assert stats['count'] == 10000
+    assert stats['max'] == 0.9999
+    assert len(metrics._stages['fetch'].sample) == 100
+    assert 0.3 < stats['p50'] < 0.7
@@ -0,0 +1,42 @@
+from normalize import normalize, unique_words, entry_keys
+from flashcard import check_for_match
+
+
+class FakeInflections:
+    def __init__(self, forms):
+        self.forms = forms
+
+    def to_lower_set(self):
+        return set(form.lower() for form in self.forms)
+
+
+class FakeEntry:
+    def __init__(self, word, forms=None):
+        self.word = word
+        self.inflections = None if forms is None else FakeInflections(forms)
+
+
+def test_russian_stress_and_yo_are_folded():
+    assert normalize('Ёлка', 'Russian') == 'елка'
+    assert normalize('до́ма', 'ru') == 'дома'
+
+
+def test_spanish_accents_are_kept():
+    assert normalize('Sí', 'Spanish') == 'sí'
+    assert normalize('Si', 'Spanish') != normalize('Sí', 'Spanish')
+
+
+def test_unique_words_keeps_first_spelling():
+    words = ['ёж', 'Еж', 'дом', 'до́м', 'дом:noun:house', 'Дом:noun:house']
+    assert unique_words(words, 'Russian') == ['ёж', 'дом', 'дом:noun:house']
+
+
+def test_entry_keys_include_inflections():
+    entry = FakeEntry('идти́', ['иду́', 'идёшь'])
+    assert entry_keys(entry, 'Russian') == {'идти', 'иду', 'идешь'}
+    assert entry.normalized_keys is entry_keys(entry, 'Russian')
+
+
+def test_check_for_match():
+    assert check_for_match(['', ['Ёлка', 'елка'], [], []], 'ёлка', 'Russian') == 'Ёлка'
+    assert check_for_match(['', ['дом'], [], []], 'кот', 'Russian') is None
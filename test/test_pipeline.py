@@ -0,0 +1,64 @@
+import pytest
+
+from pipeline import CardRouter, split_tag, tagged_words
+
+
+def test_sections_and_line_tags():
+    lines = ['дом', '[Spanish]', 'casa', '[ru] кот', '', 'Casa', '[de]', 'Haus', '[ES] casa']
+    assert tagged_words(lines, 'Russian') == ['дом', '[es] casa', 'кот', '[de] Haus']
+
+
+def test_same_word_in_two_languages_is_kept_twice():
+    assert tagged_words(['no', '[es] no', '[it] no', 'no'], 'Spanish') == ['no', '[it] no']
+
+
+def test_unknown_tag_names_the_line():
+    with pytest.raises(ValueError, match='line 2'):
+        tagged_words(['дом', '[Klingon]'], 'Russian')
+
+
+def test_untagged_word_is_in_default_language():
+    assert split_tag('дом', 'Russian') == ('Russian', 'дом')
+    assert split_tag('[es] casa: noun: house', 'Russian') == ('Spanish', 'casa: noun: house')
+
+
+class FakeCard:
+    def __init__(self, word, language):
+        self.entered_word = word
+        self.language = language
+
+
+class FakeMaker:
+    inflections = None
+
+    def __init__(self, language):
+        self.language = language
+        self.words = []
+
+    def make(self, word):
+        self.words.append(word)
+        return FakeCard(word, self.language)
+
+
+def test_router_makes_one_maker_per_language():
+    router = CardRouter('Russian', FakeMaker)
+    cards = [router.make(word) for word in tagged_words(['дом', '[es] casa', 'кот', '[es] perro'], 'Russian')]
+
+    assert sorted(router.makers) == ['Russian', 'Spanish']
+    assert router.makers['Spanish'].words == ['casa', 'perro']
+    assert [router.key(card) for card in cards] == ['дом', '[es] casa', 'кот', '[es] perro']
+
+
+def test_dictionary_store_is_opened_once_per_batch(tmp_path):
+    from dumpparser import build_store
+    from pipeline import CardMaker
+
+    dump = tmp_path / 'dump.jsonl'
+    dump.write_text('{"word": "дом", "lang": "Russian", "pos": "noun", "senses": [{"glosses": ["house"]}]}',
+                    encoding='utf-8')
+    store = str(tmp_path / 'russian.sqlite')
+    build_store(str(dump), 'Russian', store)
+
+    maker = CardMaker('Russian', dictionary=store)
+    assert maker.make('дом').word == 'дом'
+    assert maker.word_parser() is maker.word_parser()
@@ -0,0 +1,72 @@
+import socket
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy, TransientError, is_transient
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f'status {status}')
+        self.status = status
+
+
+def make_resilience(attempts=3, failure_threshold=5):
+    return Resilience(RetryPolicy(attempts, base_delay=0.01), CircuitBreaker(failure_threshold, reset_after=60),
+                      sleep=lambda seconds: None)
+
+
+def flaky(failures, error=ConnectionResetError):
+    calls = []
+
+    def fn(remaining):
+        calls.append(remaining)
+        if len(calls) <= failures:
+            raise error()
+        return 'ok'
+    return fn, calls
+
+
+def test_retries_until_success():
+    resilience = make_resilience()
+    fn, calls = flaky(2)
+    assert resilience.call('host', fn) == 'ok'
+    assert len(calls) == 3
+    assert resilience.stats() == {'retries': 2, 'failures': 0, 'rejected': 0}
+
+
+def test_gives_up_with_transient_error():
+    resilience = make_resilience(attempts=2)
+    fn, calls = flaky(5)
+    with pytest.raises(TransientError):
+        resilience.call('host', fn)
+    assert len(calls) == 2
+    assert resilience.stats()['failures'] == 1
+
+
+def test_answers_are_not_retried():
+    resilience = make_resilience()
+    fn, calls = flaky(1, lambda: StatusError(404))
+    with pytest.raises(StatusError):
+        resilience.call('host', fn)
+    assert len(calls) == 1
+    assert is_transient(StatusError(503))
+    assert not is_transient(StatusError(404))
+    assert not is_transient(ValueError())
+    assert is_transient(ConnectionResetError())
+    assert is_transient(socket.timeout())
+    assert not is_transient(FileNotFoundError())
+    assert not is_transient(PermissionError())
+
+
+def test_breaker_opens_per_host():
+    resilience = make_resilience(attempts=1, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            resilience.call('down', flaky(1)[0])
+    fn, calls = flaky(0)
+    with pytest.raises(CircuitOpenError):
+        resilience.call('down', fn)
+    assert calls == []
+    assert resilience.call('up', fn) == 'ok'
+    assert resilience.stats()['rejected'] == 1
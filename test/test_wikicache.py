@@ -0,0 +1,89 @@
+from wikicache import ParserCache, CachedParser
+
+
+class FakeParser:
+    def __init__(self):
+        self.language = 'Russian'
+        self.calls = []
+
+    def fetch(self, word):
+        self.calls.append(('fetch', word))
+        return [word.upper()]
+
+    def search(self, word):
+        self.calls.append(('search', word))
+        return [word, [word], [''], ['https://en.wiktionary.org/wiki/' + word]]
+
+    def fetch_from_url(self, url):
+        self.calls.append(('fetch_from_url', url))
+        return []
+
+
+def test_second_fetch_comes_from_cache(tmp_path):
+    cache = ParserCache(str(tmp_path / 'cache.sqlite'))
+    fake = FakeParser()
+    parser = CachedParser(fake, cache)
+
+    assert parser.fetch('дом') == ['ДОМ']
+    assert parser.fetch('дом') == ['ДОМ']
+    assert parser.search('дом')[1] == ['дом']
+    assert fake.calls == [('fetch', 'дом'), ('search', 'дом')]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_cache_survives_reopening(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    CachedParser(FakeParser(), ParserCache(path)).fetch('кот')
+
+    fake = FakeParser()
+    assert CachedParser(fake, ParserCache(path)).fetch('кот') == ['КОТ']
+    assert fake.calls == []
+
+
+def test_offline_mode_never_calls_parser(tmp_path):
+    fake = FakeParser()
+    parser = CachedParser(fake, ParserCache(str(tmp_path / 'cache.sqlite'), offline=True))
+
+    assert parser.fetch('дом') == []
+    assert parser.search('дом') == ['', [], [], []]
+    assert fake.calls == []
+
+
+def test_expired_entries_are_refetched(tmp_path):
+    cache = ParserCache(str(tmp_path / 'cache.sqlite'), ttl_days=1)
+    cache.put('Russian', 'fetch', 'дом', ['old'])
+    cache._db.execute('UPDATE responses SET created = 0')
+
+    fake = FakeParser()
+    assert CachedParser(fake, cache).fetch('дом') == ['ДОМ']
+    assert cache.stats()['expired'] == 1
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    cache = ParserCache(str(tmp_path / 'cache.sqlite'), max_mb=0.0002)
+    for i in range(20):
+        cache.put('Russian', 'fetch', str(i), [str(i) * 50])
+
+    assert cache.size <= cache.max_bytes
+    assert cache.evicted > 0
+    assert cache.get('Russian', 'fetch', '19') == (True, ['19' * 50])
+
+
+def test_hits_update_last_used_in_batches(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ParserCache(path)
+    cache.put('Russian', 'fetch', 'кот', ['КОТ'])
+
+    def last_used():
+        with sqlite3.connect(path) as db:
+            return db.execute("SELECT last_used FROM responses WHERE argument='кот'").fetchone()[0]
+
+    before = last_used()
+    assert cache.get('Russian', 'fetch', 'кот') == (True, ['КОТ'])
+    assert last_used() == before
+    cache.flush()
+    assert last_used() >= before
+    assert not cache._touched
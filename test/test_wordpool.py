@@ -0,0 +1,16 @@
+import time
+
+from wordpool import WordPool
+
+
+def test_map_keeps_input_order():
+    def make_card(index, word):
+        time.sleep(0.01 * (5 - index % 5))
+        return word.upper()
+
+    pool = WordPool(make_card, num_workers=4)
+    results = list(pool.map(['a', 'b', 'c', 'd', 'e', 'f', 'g']))
+
+    assert [i for i, _, _ in results] == list(range(7))
+    assert [card for _, _, card in results] == ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
@@ -0,0 +1,852 @@
+import collections
+import logging
+import os
+import tempfile
+import threading
+import time
+from aqt import mw
+from aqt.utils import showInfo, showCritical
+from aqt.qt import *
+from anki.importing.apkg import AnkiPackageImporter
+
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import QThread, pyqtSignal
+import PyQt5.QtWidgets
+
+from . builddeck import get_deck, DeckBuilder, DeckSet
+from . flashcard import Flashcard
+from . builddeck import to_html
+from . resultsmodel import CardTableModel
+from . wordpool import WordPool
+from . choices import ChoiceStore, Chooser
+from . journal import JobJournal
+from . import journal
+from . audiostage import AudioStage
+from . wikicache import ParserCache
+from . audiostore import AudioStore
+from . import httpclient
+from . inflindex import InflectionIndex
+from . pipeline import CardMaker, CardRouter, LANGUAGE_CODES, split_tag, tagged_words
+from . import pipeline
+from . knownwords import KnownWords
+from . metrics import get_metrics, write_report
+from . audioprocess import AudioProcessor, AudioSettings, pydub_available
+from . import resilience
+from . cancel import CancelToken, Cancelled, scope
+from . forvoquota import ForvoBudget, DeferredQueue, ForvoScheduler, apply_to_collection
+from . pyforvo import ForvoParser
+from . import folder, libfolder
+
+_LOG = logging.getLogger(__name__)
+
+
+class ProcessWords(QThread):
+    word_start = pyqtSignal(str)
+    label_update = pyqtSignal(str)
+    word_done = pyqtSignal(int)
+    word_not_found = pyqtSignal(str)
+    word_failed = pyqtSignal(str)
+    word_skipped = pyqtSignal(str)
+    add_card = pyqtSignal(Flashcard)
+    audio_done = pyqtSignal(Flashcard)
+    need_review = pyqtSignal(list)
+    done = pyqtSignal()
+
+    WORD_FOUND = 1
+    WORD_NOT_FOUND = 2
+    WORD_FOUND_NO_AUDIO = 2
+
+    def __init__(self, words: list, maker: CardRouter, num_workers: int = 4, known: dict = None,
+                 chooser: Chooser = None, job: JobJournal = None):
+        super().__init__()
+        self.words = words
+        self.stop = False
+        self.maker = maker
+        self.num_workers = num_workers
+        # language -> KnownWords of its deck, read from the collection on the main thread
+        self.known = known
+        self.chooser = Chooser(maker.language) if chooser is None else chooser
+        self.job = job
+        self.token = CancelToken()
+        self.audio = AudioStage(num_workers, self.token)
+        self._reviewed = threading.Event()
+        self._review_choices = None
+        self._remember = True
+
+    def run(self):
+        words = self.words
+        if self.known is not None:
+            words, skipped = self.maker.filter_known(words, self.known.__getitem__)
+            for word in skipped:
+                self.word_done.emit(ProcessWords.WORD_FOUND)
+                self.word_skipped.emit(word)
+
+        review = []
+        if self.job is not None:
+            words = self._resume(words, review)
+        pool = WordPool(self._make_card, self.num_workers)
+        for i, word, card in pool.map(words):
+            if self.stop:
+                break
+            self.label_update.emit(f'Checking word {word}')
+            if card is None:
+                self.word_done.emit(ProcessWords.WORD_NOT_FOUND)
+                self.word_failed.emit(word)
+            elif len(card.entries) == 0:
+                self._record(word, journal.NOT_FOUND)
+                self.word_done.emit(ProcessWords.WORD_NOT_FOUND)
+                self.word_not_found.emit(word)
+            elif len(card.entries) == 1 or self.chooser.choose(card):
+                self.word_done.emit(ProcessWords.WORD_FOUND)
+                self._add_card(card)
+            else:
+                # asked about all at once when the rest is done, so the lookups never wait on the user
+                self._record(word, journal.REVIEW, card)
+                review.append(card)
+
+            if self.stop:
+                break
+        if review and not self.stop:
+            self.label_update.emit(f'Choose entries for {len(review)} words')
+            choices = self._wait_for_review(review)
+            if choices is not None:
+                self.chooser.chosen(review, choices, self._remember)
+                for card in review:
+                    self.word_done.emit(ProcessWords.WORD_FOUND)
+                    self._add_card(card)
+        self.maker.finish()
+        # audio still being fetched finishes in the background and arrives through audio_done
+        self.audio.shutdown()
+        self.done.emit()
+
+    def _resume(self, words, review):
+        # words done on an earlier run of the same list come back from the journal instead of the network
+        outcomes = self.job.outcomes()
+        remaining = []
+        for word in words:
+            item = outcomes.get(word)
+            if item is None or item['status'] not in journal.DONE:
+                remaining.append(word)
+            elif item['status'] == journal.NOT_FOUND:
+                self.word_done.emit(ProcessWords.WORD_NOT_FOUND)
+                self.word_not_found.emit(word)
+            else:
+                card = self.job.restore(item)
+                if item['status'] == journal.CARD or self.chooser.choose(card):
+                    self.word_done.emit(ProcessWords.WORD_FOUND)
+                    self._add_card(card, item['status'] != journal.CARD)
+                else:
+                    review.append(card)
+        return remaining
+
+    def _record(self, word, status, card=None):
+        if self.job is not None:
+            # audio cut short by cancel is fetched again when the job is resumed
+            self.job.record(word, status, card, not self.token.cancelled)
+
+    def _add_card(self, card, record=True):
+        self.add_card.emit(card)
+        self.audio.submit(card, self._audio_done if record else self.audio_done.emit)
+
+    def _audio_done(self, card):
+        self._record(self.maker.key(card), journal.CARD, card)
+        self.audio_done.emit(card)
+
+    def _make_card(self, index, word):
+        self.word_start.emit(word)
+        try:
+            with scope(self.token):
+                card = self.maker.make(word)
+        except Cancelled:
+            return None
+        except Exception as e:
+            if not resilience.is_transient(e):
+                raise
+            _LOG.warning('Looking up %s failed: %s', word, e)
+            return None
+        return card
+
+    def cancel(self):
+        """Stop looking up words and abort the downloads in flight. Cards already made are still handed over."""
+        self.stop = True
+        self.token.cancel()
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def _wait_for_review(self, cards, poll=0.1):
+        self.need_review.emit(cards)
+        while not self._reviewed.wait(poll):
+            if self.stop:
+                return None
+        return self._review_choices
+
+    def review_done(self, choices, remember):
+        self._review_choices = choices
+        self._remember = remember
+        self._reviewed.set()
+
+
+class ProgressBar(PyQt5.QtWidgets.QProgressDialog):
+    review_done = pyqtSignal(list, bool)
+
+    def __init__(self, words, *args, **kwargs):
+        super(ProgressBar, self).__init__(*args, **kwargs)
+        self.words = words
+        self.num_words = len(words)
+        self.setMaximum(self.num_words)
+        self.setWindowTitle('Processing Words')
+        self.setLabelText('Beginning')
+        self.progress = 0
+        self.review = None
+
+    def on_label_update(self, label_text):
+        self.setLabelText(label_text)
+
+    def on_count_changed(self, value):
+        if self.wasCanceled():
+            # setValue would show the dialog again
+            return
+        self.progress = self.progress + 1
+        self.setValue(self.progress)
+
+    def get_review(self, cards):
+        self.review = ReviewChoices(cards)
+        self.review.choices_made.connect(self.made_choices)
+        self.review.show()
+
+    def made_choices(self, choices, remember):
+        self.review.hide()
+        self.review_done.emit(choices, remember)
+
+    def close_review(self):
+        if self.review is not None:
+            # cancelled, so the entries shown are not taken as chosen
+            self.review.answered = True
+            self.review.close()
+
+
+def get_config():
+    config = mw.addonManager.getConfig(__package__)
+    if config.get('LANGUAGE') is None:
+        config['LANGUAGE'] = 'Russian'
+    if config.get('NUM_WORKERS') is None:
+        config['NUM_WORKERS'] = 4
+    if config.get('CACHE_TTL_DAYS') is None:
+        config['CACHE_TTL_DAYS'] = 30
+    if config.get('CACHE_MAX_MB') is None:
+        config['CACHE_MAX_MB'] = 200
+    if config.get('OFFLINE') is None:
+        config['OFFLINE'] = False
+    if config.get('AUDIO_CACHE_MB') is None:
+        config['AUDIO_CACHE_MB'] = 500
+    if config.get('HTTP_TIMEOUT') is None:
+        config['HTTP_TIMEOUT'] = 15
+    if config.get('HTTP_POOL_SIZE') is None:
+        config['HTTP_POOL_SIZE'] = config['NUM_WORKERS']
+    if config.get('STREAM_EXPORT') is None:
+        config['STREAM_EXPORT'] = False
+    if config.get('EXPORT_SHARD_MB') is None:
+        config['EXPORT_SHARD_MB'] = 0
+    if config.get('SKIP_KNOWN_WORDS') is None:
+        config['SKIP_KNOWN_WORDS'] = True
+    if config.get('FORVO_DAILY_LIMIT') is None:
+        config['FORVO_DAILY_LIMIT'] = 500
+    if config.get('AUDIO_PROCESSING') is None:
+        config['AUDIO_PROCESSING'] = False
+    if config.get('AUDIO_TRIM_SILENCE') is None:
+        config['AUDIO_TRIM_SILENCE'] = True
+    if config.get('AUDIO_TARGET_DBFS') is None:
+        config['AUDIO_TARGET_DBFS'] = -20.0
+    if config.get('AUDIO_FORMAT') is None:
+        config['AUDIO_FORMAT'] = 'mp3'
+    if config.get('AUDIO_BITRATE') is None:
+        config['AUDIO_BITRATE'] = '64k'
+    if config.get('HTTP_RETRIES') is None:
+        config['HTTP_RETRIES'] = 3
+    if config.get('HTTP_DEADLINE') is None:
+        config['HTTP_DEADLINE'] = 30
+    if config.get('CIRCUIT_BREAKER_FAILURES') is None:
+        config['CIRCUIT_BREAKER_FAILURES'] = 5
+    if config.get('CIRCUIT_BREAKER_RESET') is None:
+        config['CIRCUIT_BREAKER_RESET'] = 30
+    if config.get('AUTO_CHOOSE_ENTRY') is None:
+        config['AUTO_CHOOSE_ENTRY'] = ''
+    return config
+
+
+def get_parser_cache(config):
+    if getattr(mw, 'parser_cache', None) is None:
+        mw.parser_cache = ParserCache(os.path.join(folder, 'user_files', 'wiktionary_cache.sqlite'),
+                                      ttl_days=config['CACHE_TTL_DAYS'], max_mb=config['CACHE_MAX_MB'])
+    mw.parser_cache.offline = config['OFFLINE']
+    return mw.parser_cache
+
+
+def get_inflection_index(language):
+    indexes = getattr(mw, 'inflection_indexes', None)
+    if indexes is None:
+        indexes = mw.inflection_indexes = {}
+    if language not in indexes:
+        indexes[language] = InflectionIndex(os.path.join(folder, 'user_files', f'inflections_{language}.sqlite'),
+                                            language)
+    return indexes[language]
+
+
+def get_audio_store(config):
+    if getattr(mw, 'audio_store', None) is None:
+        mw.audio_store = AudioStore(os.path.join(folder, 'user_files', 'audio'), max_mb=config['AUDIO_CACHE_MB'])
+    return mw.audio_store
+
+
+def get_audio_processor(config):
+    if not config['AUDIO_PROCESSING']:
+        return None
+    if not pydub_available():
+        _LOG.warning('AUDIO_PROCESSING is on but pydub is not installed, audio is left as downloaded')
+        return None
+    settings = AudioSettings(config['AUDIO_TRIM_SILENCE'], target_dbfs=config['AUDIO_TARGET_DBFS'],
+                             format=config['AUDIO_FORMAT'], bitrate=config['AUDIO_BITRATE'])
+    processor = getattr(mw, 'audio_processor', None)
+    if processor is None or processor.settings.key != settings.key:
+        if processor is not None:
+            processor.shutdown()
+        processor = mw.audio_processor = AudioProcessor(settings, get_audio_store(config), config['NUM_WORKERS'],
+                                                        libfolder)
+    return processor
+
+
+def get_choice_store():
+    if getattr(mw, 'choice_store', None) is None:
+        mw.choice_store = ChoiceStore(os.path.join(folder, 'user_files', 'choices.json'))
+    return mw.choice_store
+
+
+def get_forvo_scheduler(config):
+    if getattr(mw, 'forvo_scheduler', None) is None:
+        mw.forvo_scheduler = ForvoScheduler(
+            ForvoBudget(os.path.join(folder, 'user_files', 'forvo_budget.json'), config['FORVO_DAILY_LIMIT']),
+            DeferredQueue(os.path.join(folder, 'user_files', 'forvo_deferred.jsonl')))
+    mw.forvo_scheduler.budget.daily_limit = config['FORVO_DAILY_LIMIT']
+    return mw.forvo_scheduler
+
+
+def backfill_forvo_audio(scheduler):
+    # words that were over yesterday's forvo budget get their audio added to the notes made back then
+    if not os.getenv('FORVO_API_KEY') or not scheduler.queue.items() or scheduler.budget.remaining == 0:
+        return
+    out_dir = os.path.join(folder, 'user_files', 'forvo_backfill')
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    languages = {code: language for language, code in LANGUAGE_CODES.items()}
+
+    def download():
+        return scheduler.download_deferred(
+            lambda code: ForvoParser(language=code, audio_store=Flashcard.audio_store, scheduler=scheduler), out_dir)
+
+    def on_done(future):
+        try:
+            count = apply_to_collection(mw.col, future.result(), lambda code: get_deck(languages[code]),
+                                        scheduler.queue)
+        except Exception:
+            # nothing lost, the words stay queued for the next start
+            _LOG.warning('Backfilling forvo audio failed', exc_info=True)
+            return
+        _LOG.info('Added forvo audio to %d earlier notes', count)
+        if count:
+            mw.reset()
+
+    mw.taskman.run_in_background(download, on_done)
+
+
+class ResultsDisplay(PyQt5.QtWidgets.QWidget):
+    exported = pyqtSignal()
+
+    def __init__(self, cards: [Flashcard], not_found: list, language, builder=None, num_cards=None, skipped=(),
+                 pending_audio=0, timings='', failed=(), cancelled=False, *args, **kwargs):
+        super(ResultsDisplay, self).__init__(*args, **kwargs)
+        self.cards = cards
+        self.not_found = not_found
+        self.failed = failed
+        self.skipped = skipped
+        self.pending_audio = pending_audio
+        self.export_requested = False
+        self.cards_added = False
+
+        # a builder passed in already has its notes (they were streamed to it as cards arrived)
+        self.streamed = builder is not None
+        self.builder = DeckBuilder(DeckSet(language)) if builder is None else builder
+        self.num_cards = len(self.cards) if num_cards is None else num_cards
+        self.vbox = PyQt5.QtWidgets.QVBoxLayout()
+
+        self.statsLabel = PyQt5.QtWidgets.QLabel(f'Cards created: {self.num_cards}<br>Cards not found: {len(self.not_found)}'
+                                                 f'<br>Already in deck: {len(self.skipped)}'
+                                                 f'<br>Failed to look up (network): {len(self.failed)}'
+                                                 + ('<br>Cancelled, the remaining words were not looked up'
+                                                    if cancelled else ''))
+        self.statsLabel.setAlignment(QtCore.Qt.AlignCenter)
+        self.not_found_list = PyQt5.QtWidgets.QListWidget()
+        self.not_found_list.setFixedHeight(100)
+        self.not_found_list.addItems(self.not_found)
+        self.failed_list = PyQt5.QtWidgets.QListWidget()
+        self.failed_list.setFixedHeight(60)
+        self.failed_list.addItems(self.failed)
+
+        self.timings = PyQt5.QtWidgets.QPlainTextEdit(timings)
+        self.timings.setReadOnly(True)
+        self.timings.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.timings.setFixedHeight(100)
+
+        self.vbox.addWidget(self.statsLabel)
+        self.vbox.addWidget(PyQt5.QtWidgets.QLabel('Timings (seconds)'))
+        self.vbox.addWidget(self.timings)
+        self.vbox.addWidget(PyQt5.QtWidgets.QLabel('Not found'))
+        self.vbox.addWidget(self.not_found_list)
+        if self.failed:
+            # these are worth another run later, unlike the words above
+            self.vbox.addWidget(PyQt5.QtWidgets.QLabel('Failed to look up, try again later'))
+            self.vbox.addWidget(self.failed_list)
+        self.vbox.addWidget(PyQt5.QtWidgets.QLabel('Found'))
+
+        self.model = CardTableModel(self.cards, self)
+        self.proxy = QtCore.QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.proxy.setFilterKeyColumn(-1)
+
+        self.filter_edit = PyQt5.QtWidgets.QLineEdit()
+        self.filter_edit.setPlaceholderText('Filter')
+        self.filter_edit.textChanged.connect(self.proxy.setFilterFixedString)
+        self.vbox.addWidget(self.filter_edit)
+
+        self.table = PyQt5.QtWidgets.QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(-1, QtCore.Qt.AscendingOrder)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.vbox.addWidget(self.table)
+
+        self.export_button = PyQt5.QtWidgets.QPushButton('Export')
+        # self.cancel_button = QPushButton('Cancel')
+
+        self.export_button.clicked.connect(self.export_deck)
+        # self.cancel_button.clicked.connect(QApplication.instance().quit)
+
+        hbox = PyQt5.QtWidgets.QHBoxLayout()
+        hbox.addWidget(self.export_button)
+        # hbox.addWidget(self.cancel_button)
+        self.vbox.addLayout(hbox)
+
+        self.vbox.setSpacing(10)
+
+        self.setLayout(self.vbox)
+        self.setWindowTitle('Results')
+        self.resize(500, self.height())
+
+    def on_audio_done(self, card):
+        self.pending_audio -= 1
+        self.model.card_updated(card)
+        if self.export_requested and self.pending_audio == 0:
+            self.export_deck()
+
+    def export_deck(self):
+        self.export_button.setEnabled(False)
+        if self.pending_audio > 0:
+            # only the audio still being downloaded holds up the export, it carries on in on_audio_done
+            self.export_requested = True
+            self.export_button.setText(f'Waiting for audio ({self.pending_audio})')
+            return
+        self.export_button.setText('Exporting')
+        # notes are built and the package written on the builder's thread, only the import runs here
+        out_file = None
+        if not self.streamed:
+            if not self.cards_added:
+                # once only, a failed export is tried again with the notes already in the deck
+                self.builder.add_flashcards(self.cards)
+                self.cards_added = True
+            fd, out_file = tempfile.mkstemp(suffix='.apkg')
+            os.close(fd)
+        future = self.builder.export(out_file)
+        future.add_done_callback(lambda f: mw.taskman.run_on_main(lambda: self.on_exported(f, out_file)))
+
+    def on_exported(self, future, out_file):
+        try:
+            files = future.result()
+        except Exception as e:
+            _LOG.error('Export failed', exc_info=True)
+            if out_file is not None and os.path.exists(out_file):
+                os.remove(out_file)
+            self.export_requested = False
+            self.export_button.setText('Export')
+            self.export_button.setEnabled(True)
+            showCritical(f'Export failed: {e}')
+            return
+        for file in files:
+            AnkiPackageImporter(mw.col, file).run()
+        if out_file is not None:
+            # temporary packages, one per language next to out_file
+            for file in set(files) | {out_file}:
+                if os.path.exists(file):
+                    os.remove(file)
+        mw.reset()
+        self.exported.emit()
+        self.close()
+        showInfo("Deck has been exported")
+        # msg = QMessageBox()
+        # msg.setText('Deck has been exported')
+        # msg.exec()
+
+
+class WordEntry(PyQt5.QtWidgets.QMainWindow):
+    WIDTH = 500
+    HEIGHT = 500
+
+    switch_window = pyqtSignal(list)
+
+    def __init__(self):
+        super().__init__()
+        self.textEdit = None
+        self.init_ui()
+
+    def init_ui(self):
+        self.textEdit = PyQt5.QtWidgets.QTextEdit()
+        self.setCentralWidget(self.textEdit)
+
+        start_act = PyQt5.QtWidgets.QAction(self.style().standardIcon(PyQt5.QtWidgets.QStyle.SP_DialogApplyButton), 'Process', self)
+        start_act.setStatusTip('Begin Processing')
+        start_act.triggered.connect(self.process_words)
+
+        open_act = PyQt5.QtWidgets.QAction(self.style().standardIcon(PyQt5.QtWidgets.QStyle.SP_DialogOpenButton), 'Open', self)
+        open_act.setShortcut('Ctrl+O')
+        open_act.setStatusTip('Open Text File')
+        open_act.triggered.connect(self.select_file)
+
+        self.statusBar()
+
+        toolbar = self.addToolBar('asdf')
+        toolbar.addAction(start_act)
+        toolbar.addAction(open_act)
+
+        self.textEdit.setStyleSheet(
+            "margin: 10px 10px 0px; padding: 1px;"
+            "border-style: solid; border-radius: 3px; border-width: 0.5px; border-color: rgba(0,140,255,255);")
+
+        self.resize(WordEntry.WIDTH, WordEntry.HEIGHT)
+        self.center()
+        self.setWindowTitle('Flashcard Maker')
+
+    def center(self):
+        qr = self.frameGeometry()
+        cp = PyQt5.QtWidgets.QDesktopWidget().availableGeometry().center()
+        qr.moveCenter(cp)
+        self.move(qr.topLeft())
+
+    def select_file(self):
+        options = PyQt5.QtWidgets.QFileDialog.Options()
+        options |= PyQt5.QtWidgets.QFileDialog.DontUseNativeDialog
+        file_name, _ = PyQt5.QtWidgets.QFileDialog.getOpenFileName(self, "QFileDialog.getOpenFileName()", "",
+                                                  "All Files (*);;Python Files (*.py)", options=options)
+        if file_name:
+            with open(file_name, 'r', encoding='utf-8') as f:
+                data = f.read()
+            self.textEdit.setText(data)
+
+    def set_data(self, data):
+        self.textEdit.setText(data)
+
+    def process_words(self):
+        text = self.textEdit.toPlainText()
+        tmp_words = text.split('\n')
+        words = [word for word in tmp_words if word]
+        num_words = len(words)
+        reply = PyQt5.QtWidgets.QMessageBox.question(self, 'Message',
+                                     f"Process {num_words} words?", PyQt5.QtWidgets.QMessageBox.Yes |
+                                                     PyQt5.QtWidgets.QMessageBox.No, PyQt5.QtWidgets.QMessageBox.Yes)
+        if reply == PyQt5.QtWidgets.QMessageBox.Yes:
+            self.switch_window.emit(words)
+
+
+class Controller:
+    # cards kept around for the results table when notes are streamed to disk
+    STREAM_DISPLAY_ROWS = 1000
+
+    def __init__(self, language: str, language_code: str, num_workers: int = 4, cache=None, dictionary=None,
+                 stream_export=False, shard_mb=0, skip_known=True, forvo_scheduler=None, choices=None,
+                 tie_breaker=None):
+        self.word_entry = None
+        self.no_def = []
+        self.failed = []
+        self.skipped = []
+        self.no_audio = []
+        self.cards = []
+        self.num_cards = 0
+        self.cards_per_language = collections.Counter()
+        self.pending_audio = 0
+        self.builder = None
+        self.maker = None
+        self.chooser = None
+        self.num_words = 0
+        self.words = []
+        self.report_file = None
+
+        self.progress_bar = None
+        self.process_thread = None
+        self.results = None
+
+        self.language = language
+        self.language_code = language_code
+        self.num_workers = num_workers
+        self.cache = cache
+        self.dictionary = dictionary
+        self.stream_export = stream_export
+        self.shard_mb = shard_mb
+        self.skip_known = skip_known
+        self.forvo_scheduler = forvo_scheduler
+        self.choices = choices
+        self.tie_breaker = tie_breaker
+
+    def show_word_entry(self, words):
+        self.word_entry = WordEntry()
+        self.word_entry.set_data(words)
+        self.word_entry.switch_window.connect(self.start_processing)
+        self.word_entry.show()
+
+    def start_processing(self, words):
+        try:
+            words = tagged_words(words, self.language)
+        except ValueError as e:
+            showCritical(str(e))
+            return
+        job = JobJournal.for_job(os.path.join(folder, 'user_files', 'jobs'), self.language, words)
+        done = len(words) - len(job.remaining(words))
+        if done:
+            reply = PyQt5.QtWidgets.QMessageBox.question(
+                self.word_entry, 'Resume', f'{done} of {len(words)} words of this list were done on an earlier run. '
+                                           f'Carry on from there?',
+                PyQt5.QtWidgets.QMessageBox.Yes | PyQt5.QtWidgets.QMessageBox.No, PyQt5.QtWidgets.QMessageBox.Yes)
+            if reply != PyQt5.QtWidgets.QMessageBox.Yes:
+                job.clear()
+        get_metrics().reset()
+        self.num_words = len(words)
+        self.words = words
+        self.report_file = os.path.join(folder, 'user_files', 'reports', f'{self.language}-{int(time.time())}.json')
+        if self.stream_export:
+            self.cards = collections.deque(maxlen=Controller.STREAM_DISPLAY_ROWS)
+            self.builder = DeckBuilder(DeckSet(self.language))
+            export_dir = os.path.join(folder, 'user_files', 'export')
+            if not os.path.exists(export_dir):
+                os.makedirs(export_dir)
+            self.builder.stream_to(os.path.join(export_dir, f'{self.language}-{int(time.time())}.apkg'),
+                                   self.shard_mb or None)
+        mw.progress_bar = ProgressBar(words, parent=self.word_entry)
+        self.progress_bar = mw.progress_bar
+        self.maker = maker = CardRouter(self.language, self.card_maker)
+        known = self.known_words(words) if self.skip_known else None
+        self.chooser = Chooser(self.language, self.choices, self.tie_breaker)
+        self.process_thread = ProcessWords(words, maker, self.num_workers, known, self.chooser, job)
+        self.process_thread.start()
+        self.process_thread.label_update.connect(self.progress_bar.on_label_update)
+        self.process_thread.word_done.connect(self.progress_bar.on_count_changed)
+        self.process_thread.word_not_found.connect(self.word_not_found)
+        self.process_thread.word_failed.connect(self.failed.append)
+        self.process_thread.word_skipped.connect(self.skipped.append)
+        self.process_thread.add_card.connect(self.on_add_card)
+        self.process_thread.audio_done.connect(self.on_audio_done)
+        self.process_thread.need_review.connect(self.progress_bar.get_review)
+        self.progress_bar.review_done.connect(self.process_thread.review_done)
+        self.process_thread.done.connect(self.display_results)
+        self.progress_bar.canceled.connect(self.cancel)
+        self.progress_bar.show()
+
+    def card_maker(self, language):
+        # the dictionary store is built for the configured language, the others are looked up on wiktionary
+        dictionary = self.dictionary if language == self.language else None
+        language_code = self.language_code if language == self.language else LANGUAGE_CODES[language]
+        return CardMaker(language, language_code, self.cache, get_inflection_index(language), dictionary,
+                         self.forvo_scheduler)
+
+    def known_words(self, words):
+        # here and not in ProcessWords, the collection may only be used from the main thread
+        languages = {split_tag(word, self.language)[0] for word in words}
+        return {language: KnownWords.from_collection(mw.col, get_deck(language), language) for language in languages}
+
+    def cancel(self):
+        self.progress_bar.close_review()
+        self.process_thread.cancel()
+
+    def on_add_card(self, card):
+        self.num_cards += 1
+        self.cards_per_language[card.language or self.language] += 1
+        self.pending_audio += 1
+        self.cards.append(card)
+
+    def on_audio_done(self, card):
+        self.pending_audio -= 1
+        if self.builder is not None:
+            self.builder.add_flashcard(card)
+        if self.results is not None:
+            self.results.on_audio_done(card)
+
+    def display_results(self):
+        stats = httpclient.get_client().stats()
+        _LOG.info('HTTP: %d requests, %d connections opened, %d reused',
+                  stats['requests'], stats['connections_opened'], stats['connections_reused'])
+        report = self.write_report()
+        if not self.stream_export:
+            # reviewed and resumed cards were handed over after the rest, they are exported where they were entered
+            position = {word: i for i, word in enumerate(self.words)}
+            self.cards.sort(key=lambda card: position.get(self.maker.key(card), len(position)))
+        caches = ', '.join(f"{name} {report[name]['hit_rate']:.0%}" for name in ('cache', 'lemmas') if report[name])
+        self.results = ResultsDisplay(list(self.cards), self.no_def, self.language, self.builder, self.num_cards,
+                                      self.skipped, self.pending_audio,
+                                      get_metrics().summary() + f"\n\nhit rates: {caches}", self.failed,
+                                      self.process_thread.cancelled)
+        self.results.exported.connect(self.on_exported)
+        self.results.show()
+        self.word_entry.close()
+
+    def on_exported(self):
+        self.write_report()
+        if not self.process_thread.cancelled:
+            # the whole list is in the collection now, a cancelled one is kept to be resumed
+            self.process_thread.job.clear()
+
+    def write_report(self):
+        # written when the results are shown and again after export, so export timings end up in it too
+        report = get_metrics().report(
+            language=self.language, words=self.num_words, cards=self.num_cards, not_found=len(self.no_def),
+            failed=self.failed, skipped=len(self.skipped), http=httpclient.get_client().stats(),
+            network=resilience.get_resilience().stats(),
+            cache=self.cache.stats() if self.cache is not None else None,
+            audio=Flashcard.audio_store.stats() if Flashcard.audio_store is not None else None,
+            lemmas=self.maker.lemma_stats(), choices=self.chooser.stats(), cancelled=self.process_thread.cancelled,
+            languages=self.languages())
+        if not os.path.exists(os.path.dirname(self.report_file)):
+            os.makedirs(os.path.dirname(self.report_file))
+        write_report(report, self.report_file)
+        return report
+
+    def word_not_found(self, word):
+        self.no_def.append(word)
+
+    def languages(self):
+        # only worth reporting when the list mixed languages
+        return dict(self.cards_per_language) if len(self.cards_per_language) > 1 else None
+
+
+def warm_up() -> None:
+    # the rest of the heavy imports came in with this module
+    pipeline.warm_up()
+
+
+def run_addon() -> None:
+    config = get_config()
+
+    if config.get('FORVO_API_KEY'):
+        os.environ['FORVO_API_KEY'] = config['FORVO_API_KEY']
+
+    language = config['LANGUAGE']
+    if language not in LANGUAGE_CODES:
+        showCritical(f"Language {language} not supported")
+    else:
+        if 'FILE_NAME' in config:
+            # file = get_full_file_path(config['FILE_NAME'])
+            words = get_words(config['FILE_NAME'])
+        else:
+            words = ""
+        httpclient.configure(timeout=config['HTTP_TIMEOUT'], pool_size=config['HTTP_POOL_SIZE'])
+        resilience.configure(config['HTTP_RETRIES'], config['HTTP_DEADLINE'], config['CIRCUIT_BREAKER_FAILURES'],
+                             config['CIRCUIT_BREAKER_RESET'])
+        Flashcard.audio_store = get_audio_store(config)
+        Flashcard.audio_processor = get_audio_processor(config)
+        forvo_scheduler = get_forvo_scheduler(config)
+        backfill_forvo_audio(forvo_scheduler)
+        mw.controller = controller = Controller(language, LANGUAGE_CODES[language], config['NUM_WORKERS'],
+                                                get_parser_cache(config), config.get('DICTIONARY_DB'),
+                                                config['STREAM_EXPORT'], config['EXPORT_SHARD_MB'],
+                                                config['SKIP_KNOWN_WORDS'], forvo_scheduler, get_choice_store(),
+                                                config['AUTO_CHOOSE_ENTRY'])
+        controller.show_word_entry(words)
+
+
+def get_full_file_path(file_name: str) -> str:
+    file = os.path.join(os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop'), file_name)
+    return file
+
+
+def get_words(input_file: str) -> str:
+    words = ""
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            words = f.read()
+    except IOError:
+        showCritical(f"Could not open file {input_file}")
+    return words
+
+
+class ReviewChoices(PyQt5.QtWidgets.QWidget):
+    """Every word with more than one entry, to be settled in one go after the lookups are done."""
+
+    choices_made = pyqtSignal(list, bool)
+
+    def __init__(self, cards):
+        super(ReviewChoices, self).__init__()
+        self.cards = cards
+        self.groups = []
+        self.answered = False
+
+        self.setWindowTitle(f'Choose Entries ({len(cards)} words)')
+
+        words = PyQt5.QtWidgets.QWidget()
+        grid = PyQt5.QtWidgets.QGridLayout(words)
+        grid.setSpacing(10)
+        row = 0
+        for card in cards:
+            grid.addWidget(PyQt5.QtWidgets.QLabel(f'<b>{card.entered_word}</b>'), row, 0, 1, 2)
+            row += 1
+            group = PyQt5.QtWidgets.QButtonGroup(self)
+            for i, entry in enumerate(card.entries):
+                button = PyQt5.QtWidgets.QRadioButton(entry.word)
+                button.setChecked(i == 0)
+                group.addButton(button, i)
+                grid.addWidget(button, row, 0)
+                grid.addWidget(PyQt5.QtWidgets.QLabel(to_html(entry.definitions, entry.part_of_speech)), row, 1)
+                row += 1
+            self.groups.append(group)
+
+        scroll = PyQt5.QtWidgets.QScrollArea()
+        scroll.setWidget(words)
+        scroll.setWidgetResizable(True)
+
+        self.remember = PyQt5.QtWidgets.QCheckBox('Remember these choices')
+        self.remember.setChecked(True)
+        done_button = PyQt5.QtWidgets.QPushButton('Done')
+        done_button.clicked.connect(self.on_done)
+
+        hbox = PyQt5.QtWidgets.QHBoxLayout()
+        hbox.addWidget(self.remember)
+        hbox.addWidget(done_button)
+        vbox = PyQt5.QtWidgets.QVBoxLayout()
+        vbox.addWidget(scroll)
+        vbox.addLayout(hbox)
+        self.setLayout(vbox)
+        self.resize(600, 500)
+        self.center()
+
+    def center(self):
+        qr = self.frameGeometry()
+        cp = PyQt5.QtWidgets.QDesktopWidget().availableGeometry().center()
+        qr.moveCenter(cp)
+        self.move(qr.topLeft())
+
+    def on_done(self):
+        self.answered = True
+        self.choices_made.emit([group.checkedId() for group in self.groups], self.remember.isChecked())
+
+    def closeEvent(self, event):
+        # closing the window takes the entries as they are selected, the worker would wait for Done otherwise
+        if not self.answered:
+            self.on_done()
+        super(ReviewChoices, self).closeEvent(event)
+
@@ -0,0 +1,181 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+_LOG = logging.getLogger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    language TEXT NOT NULL,
+    call TEXT NOT NULL,
+    argument TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (language, call, argument)
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+'''
+
+# what each call returns when nothing is cached and we are not allowed to go online
+_OFFLINE_RESULTS = {
+    'fetch': lambda: [],
+    'fetch_from_url': lambda: [],
+    'search': lambda: ['', [], [], []],
+}
+
+
+class ParserCache:
+    DAY = 24 * 60 * 60
+    # hits only move last_used forward, so they are written in batches rather than one commit per hit
+    TOUCH_EVERY = 500
+
+    def __init__(self, path, ttl_days=30, max_mb=200, offline=False):
+        self.path = path
+        self.ttl = ttl_days * ParserCache.DAY if ttl_days else None
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.offline = offline
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, language, call, argument):
+        """Return (True, value) on a hit and (False, None) on a miss."""
+        key = (language, call, str(argument))
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT payload, created FROM responses WHERE language=? AND call=? AND argument=?', key).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl and not self.offline:
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return False, None
+            self._touched[key] = now
+            if len(self._touched) >= ParserCache.TOUCH_EVERY:
+                self._flush_touched()
+                self._db.commit()
+            self.hits += 1
+        return True, pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, language, call, argument, value):
+        try:
+            payload = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            _LOG.debug('Not caching %s(%s), result could not be pickled', call, argument, exc_info=True)
+            return
+        key = (language, call, str(argument))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                'SELECT size FROM responses WHERE language=? AND call=? AND argument=?', key).fetchone()
+            if old is not None:
+                self._total_bytes -= old[0]
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             key + (payload, len(payload), now, now))
+            self._total_bytes += len(payload)
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany('UPDATE responses SET last_used=? WHERE language=? AND call=? AND argument=?',
+                                 [(used,) + key for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def flush(self):
+        """Write out the last_used times of recent hits."""
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+
+    def _evict(self):
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+        # drop least recently used rows until we are comfortably under the limit
+        target = self.max_bytes * 0.9
+        rows = self._db.execute('SELECT rowid, size FROM responses ORDER BY last_used')
+        doomed = []
+        for rowid, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self._total_bytes -= size
+        self._db.executemany('DELETE FROM responses WHERE rowid=?', doomed)
+        self.evicted += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute('DELETE FROM responses')
+            self._db.commit()
+            self._total_bytes = 0
+
+    @property
+    def size(self):
+        return self._total_bytes
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes': self._total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+
+class CachedParser:
+    def __init__(self, parser, cache, language=None):
+        self._parser = parser
+        self._cache = cache
+        self.language = getattr(parser, 'language', None) if language is None else language
+
+    def fetch(self, word):
+        return self._cached('fetch', word)
+
+    def search(self, word):
+        return self._cached('search', word)
+
+    def fetch_from_url(self, url):
+        return self._cached('fetch_from_url', url)
+
+    def _cached(self, call, argument):
+        hit, value = self._cache.get(self.language, call, argument)
+        if hit:
+            return value
+        if self._cache.offline:
+            _LOG.debug('Offline, skipping %s(%s)', call, argument)
+            return _OFFLINE_RESULTS[call]()
+        value = getattr(self._parser, call)(argument)
+        self._cache.put(self.language, call, argument, value)
+        return value
+
+    def __getattr__(self, item):
+        return getattr(self._parser, item)
@@ -0,0 +1,35 @@
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_LOG = logging.getLogger(__name__)
+
+
+class WordPool:
+    def __init__(self, make_card, num_workers=4, prefetch=None):
+        self._make_card = make_card
+        self.num_workers = max(1, int(num_workers))
+        # how many words may be in flight ahead of the one being emitted
+        self.prefetch = self.num_workers * 4 if prefetch is None else max(1, prefetch)
+
+    def map(self, words):
+        """Yield (index, word, card) in input order while up to num_workers words are fetched at once."""
+        pending = collections.deque()
+        words = iter(enumerate(words))
+        with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='WordPool') as executor:
+            try:
+                for i, word in words:
+                    pending.append((i, word, executor.submit(self._make_card, i, word)))
+                    if len(pending) >= self.prefetch:
+                        break
+                while pending:
+                    i, word, future = pending.popleft()
+                    card = future.result()
+                    for j, next_word in words:
+                        pending.append((j, next_word, executor.submit(self._make_card, j, next_word)))
+                        break
+                    yield i, word, card
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
+